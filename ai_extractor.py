@@ -1,240 +1,1485 @@
 import os
+import asyncio
+import atexit
 import base64
-import json
+import hashlib
+import io
 import logging
-from typing import Dict, Optional, Any
+import multiprocessing
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+import numpy as np
+import orjson
 from dotenv import load_dotenv
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI, RateLimitError
 import PyPDF2
 from PIL import Image
 
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+try:
+    import easyocr
+except ImportError:
+    easyocr = None
+
 # Load environment variables
 load_dotenv()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# Set EXTRACTOR_LOG_LEVEL=WARNING in production to drop per-request INFO records
+logger.setLevel(os.getenv('EXTRACTOR_LOG_LEVEL', 'INFO').upper())
 
 # NVIDIA API configuration
 NVIDIA_API_BASE = "https://integrate.api.nvidia.com/v1"
 NVIDIA_MODEL = "meta/llama-3.2-11b-vision-instruct"
 
+# Connection pool shared by all requests to the NVIDIA endpoint
+HTTP_LIMITS = httpx.Limits(max_connections=16, max_keepalive_connections=16)
+
 # System prompt for financial data extraction
 EXTRACTION_PROMPT = """You are a financial OCR expert. Extract data from this receipt image and return ONLY valid JSON with these exact fields: vendor, date (YYYY-MM-DD), items (array of {name, price}), subtotal, tax, total, category (groceries/dining/transportation/utilities/entertainment/shopping/healthcare/other), payment_method, confidence_score (0-100). No markdown, no explanation, just JSON."""
 
+# Fields every extraction must contain, and the categories it may use
+REQUIRED_FIELDS = ('vendor', 'date', 'total', 'category', 'confidence_score')
+VALID_CATEGORIES = frozenset({'groceries', 'dining', 'transportation', 'utilities', 'entertainment', 'shopping', 'healthcare', 'other'})
+
+# Appended to the prompt when several images are packed into one request
+BATCH_PROMPT_SUFFIX = ' Return a JSON object of the form {"receipts": [...]} with one receipt object per image, in the same order as the images.'
+
+# Prompt parts built once at import; every request starts with the same
+# byte-identical prefix, so the server can reuse its cached prompt tokens
+BATCH_PROMPT_BLOCK = {"type": "text", "text": EXTRACTION_PROMPT + BATCH_PROMPT_SUFFIX}
+TEXT_PROMPT_PREFIX = f"{EXTRACTION_PROMPT}\n\nReceipt text to analyze:\n"
+
+# JSON schema for one receipt; the endpoint constrains decoding to it so the
+# response always has the required fields and a valid category
+RECEIPT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "vendor": {"type": "string"},
+        "date": {"type": "string"},
+        "items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}, "price": {"type": "number"}},
+                "required": ["name", "price"]
+            }
+        },
+        "subtotal": {"type": "number"},
+        "tax": {"type": "number"},
+        "total": {"type": "number"},
+        "category": {"type": "string", "enum": sorted(VALID_CATEGORIES)},
+        "payment_method": {"type": "string"},
+        "confidence_score": {"type": "number", "minimum": 0, "maximum": 100}
+    },
+    "required": list(REQUIRED_FIELDS)
+}
+TEXT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "receipt", "schema": RECEIPT_SCHEMA}
+}
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "receipts",
+        "schema": {
+            "type": "object",
+            "properties": {"receipts": {"type": "array", "items": RECEIPT_SCHEMA}},
+            "required": ["receipts"]
+        }
+    }
+}
+
+# Re-asks, with the validation error as feedback, when a response is still
+# unusable, and the linear backoff between them
+VALIDATION_RETRIES = 2
+VALIDATION_RETRY_BACKOFF_SECONDS = 1.0
+
+# Token budget per receipt; a full receipt JSON fits comfortably within it
+MAX_RESPONSE_TOKENS = 600
+
+# Maximum number of images sent in a single chat completion
+MAX_BATCH_SIZE = 4
+
+# Maximum number of NVIDIA requests in flight when processing files concurrently
+MAX_CONCURRENT_REQUESTS = 8
+
+# Images decoded concurrently, and the bound on items waiting between
+# stages, in the multi-image extraction pipeline
+PIPELINE_DECODE_WORKERS = min(4, os.cpu_count() or 1)
+PIPELINE_QUEUE_SIZE = 16
+
+# Attempts and base delay for exponential backoff on HTTP 429 responses
+RATE_LIMIT_RETRIES = 5
+RATE_LIMIT_BACKOFF_SECONDS = 1.0
+
+# Buffered read size and base64 chunk size (a multiple of 3) for image encoding
+IMAGE_READ_BUFFER = 64 * 1024
+BASE64_CHUNK_SIZE = 57 * 1024
+
+# Image formats (as detected by Pillow) accepted for extraction
+SUPPORTED_IMAGE_FORMATS = frozenset({'jpeg', 'png', 'gif', 'webp'})
+
+# Larger images are downscaled to fit this box and re-encoded as JPEG before upload
+MAX_IMAGE_SIZE = (1280, 1280)
+JPEG_QUALITY = 85
+JPEG_DATA_URL_PREFIX = b"data:image/jpeg;base64,"
+
+# JPEG and PNG files that already fit MAX_IMAGE_SIZE and are reasonably small
+# are sent as-is, skipping the decode and re-encode
+PASSTHROUGH_DATA_URL_PREFIXES = {
+    'jpeg': JPEG_DATA_URL_PREFIX,
+    'png': b"data:image/png;base64,"
+}
+PASSTHROUGH_MAX_BYTES = 512 * 1024
+
+# Largest allowed difference between subtotal + tax and total before a
+# transaction is flagged for review
+TOTALS_TOLERANCE = 0.02
+
+# Receipt templates of well-known chains, keyed by normalized vendor name:
+# (vendor, category). Receipt text from these is parsed with the patterns
+# below instead of calling the API
+RECEIPT_TEMPLATES = {
+    'walmart': ('Walmart', 'groceries'),
+    'target': ('Target', 'shopping'),
+    'mcdonalds': ("McDonald's", 'dining'),
+    'costco': ('Costco', 'groceries'),
+    'starbucks': ('Starbucks', 'dining')
+}
+TEMPLATE_CONFIDENCE_SCORE = 70
+
+# One alternation finds the vendor in a single pass over the text
+_TEMPLATE_VENDOR_RE = re.compile(r"\b(walmart|target|mc\s?donald'?s|costco|starbucks)\b", re.IGNORECASE)
+_AMOUNT = r"\$?\s*(\d+[.,]\d{2})\b"
+_TOTAL_RE = re.compile(r"(?<![a-z])(?<!sub)(?<!sub )total\s*:?\s*" + _AMOUNT, re.IGNORECASE)
+_SUBTOTAL_RE = re.compile(r"sub\s?total\s*:?\s*" + _AMOUNT, re.IGNORECASE)
+_TAX_RE = re.compile(r"\btax\b(?:[^$\n%]*%)?\s*:?\s*" + _AMOUNT, re.IGNORECASE)
+_ISO_DATE_RE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+_US_DATE_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{2}|\d{4})\b")
+
+# Extraction route for each supported upload extension
+FILE_TYPES = {
+    'jpg': 'image', 'jpeg': 'image', 'png': 'image', 'gif': 'image', 'webp': 'image',
+    'pdf': 'pdf',
+    'txt': 'text', 'text': 'text'
+}
+
+# Receipts and invoices rarely need more than the first few pages of a PDF
+MAX_PDF_PAGES = 8
+
+# PDFs on disk with at least this many pages are extracted in parallel worker
+# processes; in-memory uploads are read in-process rather than pickled into
+# every worker
+PDF_PARALLEL_MIN_PAGES = 4
+PDF_WORKERS = os.cpu_count() or 1
+
+# Validated extraction results, keyed by a BLAKE2b hash of the source content
+EXTRACTION_CACHE_DIR = os.path.join('.cache', 'extractions')
+EXTRACTION_CACHE_TTL = timedelta(days=7)
+
+# Extraction cache lookups since startup, reported by /api/extraction/cache
+_cache_stats = {'hits': 0, 'misses': 0}
+_cache_stats_lock = threading.Lock()
+
+# Locate the JSON object (or array, for batch responses) in a model response
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+_JSON_VALUE_RE = re.compile(r'\[.*\]|\{.*\}', re.DOTALL)
+
+# Extractors take either a path or an open binary file, such as a spooled upload
+FileSource = Union[str, BinaryIO]
+
+def _source_name(source: FileSource) -> Optional[str]:
+    """Path of a file source for logs and source_file; None for open files."""
+    return None if hasattr(source, 'read') else source
+
+def _read_source(source: BinaryIO) -> bytes:
+    """Read the whole contents of an open binary file from the start."""
+    source.seek(0)
+    return source.read()
+
+@lru_cache(maxsize=1)
 def get_nvidia_client():
-    """Initialize NVIDIA API client."""
+    """Initialize NVIDIA API client (created once and reused across calls)."""
     api_key = os.getenv('NVIDIA_API_KEY')
     if not api_key:
         logger.error("NVIDIA_API_KEY not found in environment variables")
         return None
     
     try:
+        # HTTP/2 lets concurrent requests multiplex over one kept-alive connection
         client = OpenAI(
             api_key=api_key,
-            base_url=NVIDIA_API_BASE
+            base_url=NVIDIA_API_BASE,
+            http_client=DefaultHttpxClient(http2=True, limits=HTTP_LIMITS)
         )
+        # Release pooled connections when the process exits
+        atexit.register(client.close)
+        # lru_cache runs this body once per process, so this logs only on first init
         logger.info("NVIDIA API client initialized successfully")
         return client
     except Exception as e:
-        logger.error(f"Failed to initialize NVIDIA API client: {e}")
+        logger.error("Failed to initialize NVIDIA API client: %s", e)
+        return None
+
+@lru_cache(maxsize=1)
+def get_async_nvidia_client():
+    """Initialize async NVIDIA API client (created once and reused across calls)."""
+    api_key = os.getenv('NVIDIA_API_KEY')
+    if not api_key:
+        logger.error("NVIDIA_API_KEY not found in environment variables")
+        return None
+    
+    try:
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=NVIDIA_API_BASE,
+            http_client=DefaultAsyncHttpxClient(http2=True, limits=HTTP_LIMITS)
+        )
+        logger.info("Async NVIDIA API client initialized successfully")
+        return client
+    except Exception as e:
+        logger.error("Failed to initialize async NVIDIA API client: %s", e)
         return None
 
-def encode_image_to_base64(image_path: str) -> Optional[str]:
+def encode_image_to_base64(image_path: str) -> Optional[str]:
+    """
+    Convert an image file to base64 encoding.
+    
+    Args:
+        image_path: Path to the image file
+        
+    Returns:
+        Base64 encoded string or None if error
+    """
+    try:
+        encoded_chunks = []
+        with open(image_path, "rb", buffering=IMAGE_READ_BUFFER) as image_file:
+            # Chunk size is a multiple of 3 so each chunk encodes without padding
+            while chunk := image_file.read(BASE64_CHUNK_SIZE):
+                encoded_chunks.append(base64.b64encode(chunk))
+        return b"".join(encoded_chunks).decode('ascii')
+    except Exception as e:
+        logger.error("Error encoding image to base64: %s", e)
+        return None
+
+def _encode_resized(image_bytes: bytes) -> Optional[bytes]:
+    """
+    Downscale an image to MAX_IMAGE_SIZE and encode it as base64 JPEG.
+    
+    Phone photos are far larger than the vision model needs, so shrinking
+    them before upload cuts the request size by an order of magnitude.
+    
+    Args:
+        image_bytes: Raw contents of the image file
+        
+    Returns:
+        Base64 encoded JPEG bytes or None if error
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            # Let the JPEG decoder downscale by a power of two while decoding,
+            # so full-resolution photos are never decoded at full size
+            image.draft('RGB', MAX_IMAGE_SIZE)
+            image.thumbnail(MAX_IMAGE_SIZE, Image.LANCZOS)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=False)
+        
+        return base64.b64encode(buffer.getvalue())
+    except Exception as e:
+        logger.error("Error resizing image for upload: %s", e)
+        return None
+
+def validate_extracted_data(data: Dict[str, Any]) -> bool:
+    """
+    Validate that extracted data contains required fields.
+    
+    Args:
+        data: Dictionary containing extracted data
+        
+    Returns:
+        True if data is valid, False otherwise
+    """
+    error = _validation_error(data)
+    if error:
+        logger.warning(error)
+        return False
+    
+    # Normalize category to lowercase
+    data['category'] = data['category'].lower()
+    
+    return True
+
+def _validation_error(data: Dict[str, Any]) -> Optional[str]:
+    """
+    Describe why extracted data is invalid.
+    
+    Args:
+        data: Dictionary containing extracted data
+        
+    Returns:
+        Error message, or None if the data is valid
+    """
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            return f"Missing required field: {field}"
+    
+    # Validate confidence score
+    confidence_score = data['confidence_score']
+    if isinstance(confidence_score, bool) or not isinstance(confidence_score, (int, float)) or not (0 <= confidence_score <= 100):
+        return "Invalid confidence_score"
+    
+    # Validate category, case-insensitively
+    category = data['category']
+    if not isinstance(category, str) or category.lower() not in VALID_CATEGORIES:
+        return f"Invalid category: {category}"
+    
+    return None
+
+def _response_error(content: str) -> Optional[str]:
+    """
+    Check a raw model response before it is post-processed.
+    
+    Args:
+        content: Raw response content from the model
+        
+    Returns:
+        Feedback for the model describing the problem, or None if usable
+    """
+    parsed = _loads_response(content, _JSON_VALUE_RE)
+    if parsed is None:
+        return "The response was not valid JSON."
+    
+    if isinstance(parsed, dict) and isinstance(parsed.get('receipts'), list):
+        parsed = parsed['receipts']
+    for extracted_data in parsed if isinstance(parsed, list) else [parsed]:
+        if not isinstance(extracted_data, dict):
+            return "Each receipt must be a JSON object."
+        error = _validation_error(extracted_data)
+        if error:
+            return error
+    
+    return None
+
+def _feedback_kwargs(request_kwargs: Dict[str, Any], content: str, error: str) -> Dict[str, Any]:
+    """Append the rejected response and the error to the conversation for a retry."""
+    messages = request_kwargs["messages"] + [
+        {"role": "assistant", "content": content},
+        {"role": "user", "content": f"{error} Return only the corrected JSON."}
+    ]
+    return dict(request_kwargs, messages=messages)
+
+def _complete_validated(client, request_kwargs: Dict[str, Any]) -> str:
+    """
+    Run a streamed completion, re-asking up to VALIDATION_RETRIES times with
+    the validation error as feedback when the response is unusable.
+    
+    Args:
+        client: OpenAI client
+        request_kwargs: Keyword arguments for chat.completions.create
+        
+    Returns:
+        Last response text received
+    """
+    content = _stream_completion(client, request_kwargs)
+    for attempt in range(VALIDATION_RETRIES):
+        error = _response_error(content)
+        if not error:
+            break
+        logger.warning("Unusable extraction response (%s), retrying", error)
+        time.sleep(VALIDATION_RETRY_BACKOFF_SECONDS * (attempt + 1))
+        content = _stream_completion(client, _feedback_kwargs(request_kwargs, content, error))
+    return content
+
+async def _complete_validated_async(client, request_kwargs: Dict[str, Any]) -> str:
+    """
+    Async variant of _complete_validated.
+    
+    Args:
+        client: AsyncOpenAI client
+        request_kwargs: Keyword arguments for chat.completions.create
+        
+    Returns:
+        Last response text received
+    """
+    content = await _stream_completion_async(client, request_kwargs)
+    for attempt in range(VALIDATION_RETRIES):
+        error = _response_error(content)
+        if not error:
+            break
+        logger.warning("Unusable extraction response (%s), retrying", error)
+        await asyncio.sleep(VALIDATION_RETRY_BACKOFF_SECONDS * (attempt + 1))
+        content = await _stream_completion_async(client, _feedback_kwargs(request_kwargs, content, error))
+    return content
+
+def _as_float(value: Any) -> float:
+    """Coerce an extracted amount to float, using NaN for missing or non-numeric values."""
+    if isinstance(value, bool):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def check_totals(extractions: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Check that subtotal + tax matches total for a batch of extractions.
+    
+    Args:
+        extractions: Extraction results to check
+        
+    Returns:
+        Boolean mask, True where the amounts are present but do not add up
+    """
+    amounts = np.array(
+        [[_as_float(data.get(field)) for field in ('subtotal', 'tax', 'total')] for data in extractions],
+        dtype=np.float64
+    ).reshape(-1, 3)
+    
+    # Receipts missing any amount are not flagged; there is nothing to compare
+    mismatch = np.abs(amounts[:, 0] + amounts[:, 1] - amounts[:, 2]) > TOTALS_TOLERANCE
+    return mismatch & np.isfinite(amounts).all(axis=1)
+
+class _JsonScanner:
+    """
+    Incrementally track bracket depth of a streamed JSON value so the
+    stream can be closed as soon as the top-level object or array ends.
+    """
+    
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, text: str) -> bool:
+        """
+        Consume the next piece of streamed text.
+        
+        Args:
+            text: Newly received response text
+            
+        Returns:
+            True once the top-level JSON value has been closed
+        """
+        for char in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                if self.started:
+                    self.in_string = True
+            elif char in '{[':
+                self.started = True
+                self.depth += 1
+            elif char in '}]' and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+        return False
+
+def _stream_completion(client, request_kwargs: Dict[str, Any]) -> str:
+    """
+    Run a streamed chat completion and stop reading once the JSON ends.
+    
+    Any prose the model adds after the JSON is never generated, which
+    trims decoding time off every request.
+    
+    Args:
+        client: OpenAI client
+        request_kwargs: Keyword arguments for chat.completions.create
+        
+    Returns:
+        Response text received up to the end of the top-level JSON value
+    """
+    stream = client.chat.completions.create(**request_kwargs, stream=True)
+    scanner = _JsonScanner()
+    parts = []
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            if scanner.feed(delta):
+                break
+    finally:
+        # Closing the stream early tells the server to stop generating
+        close = getattr(stream, 'close', None)
+        if close:
+            close()
+    
+    return "".join(parts).strip()
+
+async def _stream_completion_async(client, request_kwargs: Dict[str, Any]) -> str:
+    """
+    Async variant of _stream_completion.
+    
+    Args:
+        client: AsyncOpenAI client
+        request_kwargs: Keyword arguments for chat.completions.create
+        
+    Returns:
+        Response text received up to the end of the top-level JSON value
+    """
+    # Back off exponentially when concurrent uploads hit the API rate limit
+    for attempt in range(RATE_LIMIT_RETRIES):
+        try:
+            stream = await client.chat.completions.create(**request_kwargs, stream=True)
+            break
+        except RateLimitError:
+            if attempt == RATE_LIMIT_RETRIES - 1:
+                raise
+            delay = RATE_LIMIT_BACKOFF_SECONDS * (2 ** attempt)
+            logger.warning("NVIDIA API rate limit hit, retrying in %.0fs", delay)
+            await asyncio.sleep(delay)
+    scanner = _JsonScanner()
+    parts = []
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            if scanner.feed(delta):
+                break
+    finally:
+        close = getattr(stream, 'close', None)
+        if close:
+            await close()
+    
+    return "".join(parts).strip()
+
+def _extract_json(content: str, pattern: "re.Pattern" = None) -> str:
+    """
+    Slice the JSON portion out of a model response in a single scan,
+    dropping markdown fences and any surrounding prose.
+    
+    Args:
+        content: Raw response content from the model
+        pattern: Compiled pattern to search with (defaults to a JSON object)
+        
+    Returns:
+        The matched JSON text, or the content unchanged if nothing matched
+    """
+    match = (pattern or _JSON_OBJECT_RE).search(content)
+    return match.group(0) if match else content
+
+def _loads_response(content: str, pattern: "re.Pattern" = None) -> Any:
+    """
+    Parse a model response as JSON.
+    
+    With JSON mode the response is the bare JSON value, so it is parsed
+    directly; slicing out the JSON is only a fallback for endpoints that
+    ignore response_format and wrap the JSON in markdown or prose.
+    
+    Args:
+        content: Raw response content from the model
+        pattern: Compiled pattern used by the fallback slice
+        
+    Returns:
+        Parsed JSON value or None if parsing fails
+    """
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        pass
+    
+    content = _extract_json(content, pattern)
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError as e:
+        logger.error("Failed to parse JSON response: %s", e)
+        logger.error("Response content: %s", content)
+        return None
+
+def _finalize_extraction(extracted_data: Any, extraction_method: str,
+                         source_file: Optional[str] = None,
+                         cache_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Validate a parsed extraction, attach metadata and cache it.
+    
+    Args:
+        extracted_data: Parsed JSON object from the model
+        extraction_method: Value recorded in the extraction_method field
+        source_file: Path of the file the data came from, if any
+        cache_key: Cache key under which to store the validated result
+        
+    Returns:
+        Dictionary containing extracted financial data or None if invalid
+    """
+    # Validate extracted data
+    if not isinstance(extracted_data, dict) or not validate_extracted_data(extracted_data):
+        logger.error("Extracted data validation failed (source: %s)", source_file)
+        return None
+    
+    # Add metadata
+    extracted_data['extraction_method'] = extraction_method
+    if source_file:
+        extracted_data['source_file'] = source_file
+    if cache_key:
+        _cache_put(cache_key, extracted_data)
+    
+    logger.info("Successfully extracted data (%s) - Vendor: %s, Total: $%s", extraction_method, extracted_data.get('vendor'), extracted_data.get('total'))
+    return extracted_data
+
+def _postprocess_response(content: str, extraction_method: str,
+                          source_file: Optional[str] = None,
+                          cache_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Turn a raw single-receipt model response into validated extraction data.
+    
+    Args:
+        content: Raw response content from the model
+        extraction_method: Value recorded in the extraction_method field
+        source_file: Path of the file the data came from, if any
+        cache_key: Cache key under which to store the validated result
+        
+    Returns:
+        Dictionary containing extracted financial data or None if invalid
+    """
+    logger.info("NVIDIA API response received: %d characters", len(content))
+    
+    extracted_data = _loads_response(content)
+    if extracted_data is None:
+        return None
+    
+    return _finalize_extraction(extracted_data, extraction_method, source_file, cache_key)
+
+def _cache_key(data: bytes, model: str = NVIDIA_MODEL, prompt: str = EXTRACTION_PROMPT) -> str:
+    """
+    Content hash used to key the extraction cache.
+    
+    The model name and prompt are hashed in with the content, so changing
+    either one invalidates old entries. Each part is length-prefixed so
+    different splits of the same bytes cannot collide.
+    
+    Args:
+        data: Raw file bytes or UTF-8 encoded text
+        model: Model the extraction was produced by
+        prompt: Prompt the extraction was produced with
+        
+    Returns:
+        Hex digest identifying the cache entry
+    """
+    # BLAKE2b is markedly faster than SHA-256 on the short inputs hashed here
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (model.encode('utf-8'), prompt.encode('utf-8'), data):
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a previously validated extraction result, counting hits and misses.
+    
+    Args:
+        key: Content hash of the source file or text
+        
+    Returns:
+        Cached extraction result or None on a miss
+    """
+    data = _read_cache_entry(key)
+    with _cache_stats_lock:
+        _cache_stats['hits' if data is not None else 'misses'] += 1
+    return data
+
+def get_extraction_cache_stats() -> Dict[str, int]:
+    """
+    Report extraction cache lookups since startup.
+    
+    Returns:
+        Dict with 'hits' and 'misses' counts
+    """
+    with _cache_stats_lock:
+        return dict(_cache_stats)
+
+def _read_cache_entry(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Read and revalidate one extraction cache entry.
+    
+    Args:
+        key: Content hash of the source file or text
+        
+    Returns:
+        Cached extraction result or None if missing, invalid or expired
+    """
+    cache_path = os.path.join(EXTRACTION_CACHE_DIR, f"{key}.json")
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Ignoring unreadable extraction cache entry %s: %s", cache_path, e)
+        return None
+    
+    # Revalidate on recall so stale or hand-edited entries are never returned
+    data = cached.get('data') if isinstance(cached, dict) else None
+    if not isinstance(data, dict) or not validate_extracted_data(data):
+        logger.warning("Ignoring invalid extraction cache entry %s", cache_path)
+        return None
+    
+    try:
+        cached_at = datetime.fromisoformat(cached['cached_at'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if datetime.now(timezone.utc) - cached_at > EXTRACTION_CACHE_TTL:
+        return None
+    
+    logger.info("Extraction cache hit: %s", key[:12])
+    return data
+
+def _cache_put(key: str, data: Dict[str, Any]) -> None:
+    """
+    Store a validated extraction result.
+    
+    Args:
+        key: Content hash of the source file or text
+        data: Validated extraction result
+    """
+    cache_path = os.path.join(EXTRACTION_CACHE_DIR, f"{key}.json")
+    try:
+        os.makedirs(EXTRACTION_CACHE_DIR, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        entry = {
+            'model': NVIDIA_MODEL,
+            'cached_at': datetime.now(timezone.utc).isoformat(),
+            'data': data
+        }
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(entry))
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.warning("Failed to write extraction cache entry %s: %s", cache_path, e)
+
+def _detect_image_format(image_path: FileSource) -> Optional[str]:
+    """
+    Detect an image's format with Pillow, reading only the file header.
+    
+    Args:
+        image_path: Path to the image file, or an open binary file
+        
+    Returns:
+        Lowercase Pillow format name (e.g. 'jpeg', 'png') or None if unknown
+    """
+    try:
+        with Image.open(image_path) as image:
+            return image.format.lower() if image.format else None
+    except Exception:
+        return None
+
+def _read_image(image_path: FileSource) -> Optional[bytes]:
+    """
+    Read a receipt image after checking its format and existence.
+    
+    Args:
+        image_path: Path to the image file, or an open binary file
+        
+    Returns:
+        Raw image bytes or None if the image cannot be used
+    """
+    if hasattr(image_path, 'read'):
+        image_bytes = _read_source(image_path)
+        image_format = _detect_image_format(io.BytesIO(image_bytes))
+        if image_format not in SUPPORTED_IMAGE_FORMATS:
+            logger.error("Unsupported image format: %s (uploaded file)", image_format or 'unknown')
+            return None
+        return image_bytes
+    
+    # Check if file exists
+    if not os.path.exists(image_path):
+        logger.error("Image file not found: %s", image_path)
+        return None
+    
+    # Detect the actual format from the file header rather than trusting the
+    # extension, so mislabeled files fail here instead of at the API
+    image_format = _detect_image_format(image_path)
+    if image_format not in SUPPORTED_IMAGE_FORMATS:
+        logger.error("Unsupported image format: %s (%s)", image_format or 'unknown', image_path)
+        return None
+    
+    try:
+        with open(image_path, 'rb') as image_file:
+            return image_file.read()
+    except Exception as e:
+        logger.error("Error reading image file %s: %s", image_path, e)
+        return None
+
+def _passthrough_prefix(image_bytes: bytes) -> Optional[bytes]:
+    """
+    Check whether an image can be sent without re-encoding.
+    
+    Only the header is parsed, so this never decodes the pixel data.
+    
+    Args:
+        image_bytes: Raw contents of the image file
+        
+    Returns:
+        Data URL prefix for the image's format, or None if it must be re-encoded
+    """
+    if len(image_bytes) > PASSTHROUGH_MAX_BYTES:
+        return None
+    
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image_format = (image.format or '').lower()
+            fits = image.width <= MAX_IMAGE_SIZE[0] and image.height <= MAX_IMAGE_SIZE[1]
+    except Exception:
+        return None
+    
+    return PASSTHROUGH_DATA_URL_PREFIXES.get(image_format) if fits else None
+
+def _build_image_block(image_bytes: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Build an image_url content block for a receipt image.
+    
+    Args:
+        image_bytes: Raw contents of the image file
+        
+    Returns:
+        Content block dictionary or None if the image cannot be used
+    """
+    prefix = _passthrough_prefix(image_bytes)
+    if prefix:
+        base64_image = base64.b64encode(image_bytes)
+    else:
+        # Anything else is downscaled and re-encoded as JPEG
+        prefix = JPEG_DATA_URL_PREFIX
+        base64_image = _encode_resized(image_bytes)
+        if not base64_image:
+            return None
+    
+    # base64 output is pure ASCII, so build the URL as bytes and decode once
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": (prefix + base64_image).decode('ascii')
+        }
+    }
+
+def _parse_batch_response(content: str) -> Optional[List[Any]]:
+    """
+    Parse a model response that should contain a {"receipts": [...]} object.
+    
+    Args:
+        content: Raw response content from the model
+        
+    Returns:
+        List of parsed objects or None if parsing fails
+    """
+    parsed = _loads_response(content, _JSON_VALUE_RE)
+    if parsed is None:
+        return None
+    
+    # A bare array or a single receipt object is accepted as well, since
+    # models sometimes unwrap the envelope for one-image batches
+    if isinstance(parsed, dict):
+        receipts = parsed.get('receipts')
+        return receipts if isinstance(receipts, list) else [parsed]
+    if isinstance(parsed, list):
+        return parsed
+    
+    logger.error("Unexpected JSON response type: %s", type(parsed).__name__)
+    return None
+
+def _prepare_batch(image_paths: List[str]) -> Tuple[List[Optional[Dict[str, Any]]], List[Dict[str, Any]], List[int], List[str]]:
+    """
+    Resolve cached images and build content blocks for the rest of a batch.
+    
+    Args:
+        image_paths: Paths to the image files
+        
+    Returns:
+        Tuple of (results pre-filled with cache hits, content blocks,
+        index of the source path for each block, cache key for each block)
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(image_paths)
+    blocks = []
+    positions = []
+    cache_keys = []
+    for index, image_path in enumerate(image_paths):
+        image_bytes = _read_image(image_path)
+        if not image_bytes:
+            continue
+        
+        # Re-uploaded receipts skip the API call entirely
+        key = _cache_key(image_bytes)
+        cached = _cache_get(key)
+        if cached:
+            cached.pop('source_file', None)
+            if _source_name(image_path):
+                cached['source_file'] = image_path
+            results[index] = cached
+            continue
+        
+        block = _build_image_block(image_bytes)
+        if block:
+            blocks.append(block)
+            positions.append(index)
+            cache_keys.append(key)
+    
+    return results, blocks, positions, cache_keys
+
+def _batch_request_kwargs(blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build chat completion arguments for a batch of image content blocks.
+    
+    Args:
+        blocks: Image content blocks to pack into the request
+        
+    Returns:
+        Keyword arguments for chat.completions.create
+    """
+    return {
+        "model": NVIDIA_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": [BATCH_PROMPT_BLOCK] + blocks
+            }
+        ],
+        "max_tokens": MAX_RESPONSE_TOKENS * len(blocks),
+        "temperature": 0.1,
+        "response_format": BATCH_RESPONSE_FORMAT
+    }
+
+def _fan_out_batch(content: str, image_paths: List[str], positions: List[int],
+                   cache_keys: List[str], results: List[Optional[Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Split a batch response back into one result per source image.
+    
+    Args:
+        content: Raw response content from the model
+        image_paths: Paths to the image files in the batch
+        positions: Index of the source path for each image sent
+        cache_keys: Cache key for each image sent
+        results: Per-path results to fill in
+        
+    Returns:
+        List with one extraction result (or None) per input path
+    """
+    logger.info("NVIDIA API response received: %d characters", len(content))
+    
+    parsed = _parse_batch_response(content)
+    if parsed is None:
+        return results
+    
+    if len(parsed) != len(positions):
+        logger.warning("Expected %d receipts in batch response, got %d", len(positions), len(parsed))
+    
+    for index, key, extracted_data in zip(positions, cache_keys, parsed):
+        results[index] = _finalize_extraction(extracted_data, 'nvidia_nemotron', _source_name(image_paths[index]), key)
+    
+    return results
+
+def _extract_batch_chunk(image_paths: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Extract financial data from up to MAX_BATCH_SIZE images in one API call.
+    
+    Args:
+        image_paths: Paths to the image files
+        
+    Returns:
+        List with one extraction result (or None) per input path
+    """
+    results, blocks, positions, cache_keys = _prepare_batch(image_paths)
+    if not blocks:
+        return results
+    
+    # Get NVIDIA API client
+    client = get_nvidia_client()
+    if not client:
+        return results
+    
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Processing %d image(s) with NVIDIA Nemotron: %s", len(blocks),
+                    ', '.join(_source_name(image_paths[i]) or 'uploaded file' for i in positions))
+    
+    # Call NVIDIA API with every image packed into a single request
+    content = _complete_validated(client, _batch_request_kwargs(blocks))
+    return _fan_out_batch(content, image_paths, positions, cache_keys, results)
+
+def extract_from_images_batch(image_paths: List[str], max_batch_size: int = MAX_BATCH_SIZE) -> List[Optional[Dict[str, Any]]]:
+    """
+    Extract financial data from several receipt images, packing up to
+    max_batch_size images into each NVIDIA API call.
+    
+    Args:
+        image_paths: Paths to the image files
+        max_batch_size: Maximum number of images sent in a single request
+        
+    Returns:
+        List with one extraction result (or None) per input path, in order
+    """
+    results: List[Optional[Dict[str, Any]]] = []
+    max_batch_size = max(1, max_batch_size)
+    
+    for start in range(0, len(image_paths), max_batch_size):
+        chunk = image_paths[start:start + max_batch_size]
+        try:
+            results.extend(_extract_batch_chunk(chunk))
+        except Exception as e:
+            logger.error("Error extracting data from images using NVIDIA API: %s", e)
+            results.extend([None] * len(chunk))
+    
+    # Fall back to local OCR for any image the vision model could not read
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = extract_with_ocr(image_paths[index])
+    
+    return results
+
+@lru_cache(maxsize=1)
+def _get_ocr_reader():
+    """Load the EasyOCR model once per process; loading takes several seconds."""
+    logger.info("Loading EasyOCR model")
+    return easyocr.Reader(['en'], gpu=False, verbose=False)
+
+def warm_up():
+    """
+    Create the NVIDIA clients and load the EasyOCR fallback model up front.
+    
+    Lets long-running callers (a test session, a worker) pay the model load
+    once before the first receipt instead of inside it.
+    """
+    get_nvidia_client()
+    get_async_nvidia_client()
+    if easyocr is not None:
+        _get_ocr_reader()
+
+def extract_text_with_ocr(image_path: Union[str, bytes]) -> str:
     """
-    Convert an image file to base64 encoding.
+    Read the text of a receipt image with EasyOCR.
     
     Args:
-        image_path: Path to the image file
+        image_path: Path to the image file, or its contents
         
     Returns:
-        Base64 encoded string or None if error
+        Recognized text, one detected paragraph per line
     """
-    try:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
-    except Exception as e:
-        logger.error(f"Error encoding image to base64: {e}")
+    reader = _get_ocr_reader()
+    return "\n".join(reader.readtext(image_path, detail=0, paragraph=True))
+
+def _parse_amount(match: Optional["re.Match"]) -> Optional[float]:
+    """Convert a matched amount (allowing a comma decimal separator) to float."""
+    return float(match.group(1).replace(',', '.')) if match else None
+
+def _parse_template_date(text: str) -> Optional[str]:
+    """Find the first receipt date in OCR text and normalize it to YYYY-MM-DD."""
+    match = _ISO_DATE_RE.search(text)
+    if match:
+        return match.group(0)
+    
+    match = _US_DATE_RE.search(text)
+    if not match:
         return None
+    month, day, year = (int(part) for part in match.groups())
+    if year < 100:
+        year += 2000
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}"
 
-def validate_extracted_data(data: Dict[str, Any]) -> bool:
+def extract_with_templates(text_content: str) -> Optional[Dict[str, Any]]:
     """
-    Validate that extracted data contains required fields.
+    Extract data from the text of a receipt printed by a well-known chain
+    using precompiled patterns, without calling the API.
     
     Args:
-        data: Dictionary containing extracted data
+        text_content: Receipt text from OCR, a PDF or a text upload
         
     Returns:
-        True if data is valid, False otherwise
+        Dictionary containing extracted financial data, or None if the
+        vendor is unknown or any required field does not match
     """
-    required_fields = ['vendor', 'date', 'total', 'category', 'confidence_score']
-    
-    for field in required_fields:
-        if field not in data:
-            logger.warning(f"Missing required field: {field}")
-            return False
-    
-    # Validate confidence score
-    if not isinstance(data.get('confidence_score'), (int, float)) or not (0 <= data['confidence_score'] <= 100):
-        logger.warning("Invalid confidence_score")
-        return False
+    match = _TEMPLATE_VENDOR_RE.search(text_content)
+    if not match:
+        return None
+    vendor, category = RECEIPT_TEMPLATES[re.sub(r"[^a-z]", "", match.group(1).lower())]
     
-    # Validate category (normalize to lowercase)
-    valid_categories = ['groceries', 'dining', 'transportation', 'utilities', 'entertainment', 'shopping', 'healthcare', 'other']
-    category = data.get('category', '').lower()
-    if category not in valid_categories:
-        logger.warning(f"Invalid category: {data.get('category')}")
-        return False
+    date = _parse_template_date(text_content)
+    total = _parse_amount(_TOTAL_RE.search(text_content))
+    if date is None or total is None:
+        return None
     
-    # Normalize category to lowercase
-    data['category'] = category
+    extracted_data = {
+        'vendor': vendor,
+        'date': date,
+        'items': [],
+        'subtotal': _parse_amount(_SUBTOTAL_RE.search(text_content)),
+        'tax': _parse_amount(_TAX_RE.search(text_content)),
+        'total': total,
+        'category': category,
+        'payment_method': 'unknown',
+        'confidence_score': TEMPLATE_CONFIDENCE_SCORE
+    }
+    if not validate_extracted_data(extracted_data):
+        return None
     
-    return True
+    extracted_data['extraction_method'] = 'template'
+    logger.info("Matched %s receipt template - Total: $%s", vendor, total)
+    return extracted_data
 
-def extract_from_image(image_path: str) -> Optional[Dict[str, Any]]:
+def extract_with_ocr(image_path: FileSource) -> Optional[Dict[str, Any]]:
     """
-    Extract financial data from receipt image using NVIDIA Nemotron Nano 2 VL model.
+    Fallback extraction for images the vision model could not handle:
+    read the text locally with EasyOCR and extract data from that text.
     
     Args:
-        image_path: Path to the image file
+        image_path: Path to the image file, or an open binary file
         
     Returns:
         Dictionary containing extracted financial data or None if extraction fails
     """
+    source_name = _source_name(image_path)
+    if easyocr is None or (source_name and not os.path.exists(source_name)):
+        return None
+    
     try:
-        # Check if file exists
-        if not os.path.exists(image_path):
-            logger.error(f"Image file not found: {image_path}")
+        logger.info("Falling back to OCR for image: %s", source_name or 'uploaded file')
+        text_content = extract_text_with_ocr(source_name or _read_source(image_path))
+        if not text_content.strip():
+            logger.error("No text recognized in image")
             return None
         
-        # Get NVIDIA API client
-        client = get_nvidia_client()
-        if not client:
-            return None
+        logger.info("Recognized %d characters with OCR", len(text_content))
         
-        # Encode image to base64
-        base64_image = encode_image_to_base64(image_path)
-        if not base64_image:
-            return None
+        # Templated receipts from well-known chains are parsed without the API
+        result = extract_from_text(text_content)
+        if result:
+            result['extraction_method'] = 'simple_ocr'
+            if source_name:
+                result['source_file'] = source_name
         
-        # Determine image format
-        image_format = image_path.lower().split('.')[-1]
-        if image_format not in ['jpg', 'jpeg', 'png', 'gif', 'webp']:
-            logger.error(f"Unsupported image format: {image_format}")
-            return None
+        return result
         
-        logger.info(f"Processing image with NVIDIA Nemotron: {image_path}")
-        
-        # Call NVIDIA API
-        response = client.chat.completions.create(
-            model=NVIDIA_MODEL,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": EXTRACTION_PROMPT
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/{image_format};base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=1000,
-            temperature=0.1
-        )
+    except Exception as e:
+        logger.error("Error extracting data from image using OCR: %s", e)
+        return None
+
+def extract_from_image(image_path: FileSource) -> Optional[Dict[str, Any]]:
+    """
+    Extract financial data from receipt image using NVIDIA Nemotron Nano 2 VL model.
+    
+    Args:
+        image_path: Path to the image file, or an open binary file
         
-        # Extract response content
-        content = response.choices[0].message.content.strip()
-        logger.info(f"NVIDIA API response received: {len(content)} characters")
+    Returns:
+        Dictionary containing extracted financial data or None if extraction fails
+    """
+    return extract_from_images_batch([image_path])[0]
+
+class AsyncBatcher:
+    """
+    Collect concurrent image extraction calls into batched NVIDIA requests.
+    
+    Calls are queued and flushed either when max_batch_size images are
+    waiting or when the oldest queued call has waited max_latency_ms.
+    """
+    
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_latency_ms: int = 100):
+        """
+        Initialize the batcher.
         
-        # Clean up response (remove markdown and extract JSON)
-        if content.startswith('```json'):
-            content = content.replace('```json', '').replace('```', '').strip()
-        elif content.startswith('```'):
-            content = content.replace('```', '').strip()
+        Args:
+            max_batch_size: Maximum number of images per NVIDIA request
+            max_latency_ms: Maximum time a call waits for others to join its batch
+        """
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_latency_ms = max_latency_ms
+        self._loop = None
+        self._queue = None
+        self._worker = None
+    
+    def _ensure_worker(self):
+        """Start the background flush task on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+    
+    def submit(self, image_path: str) -> "asyncio.Future":
+        """
+        Queue an image for extraction.
         
-        # Extract JSON from response if it contains extra text
-        json_start = content.find('{')
-        json_end = content.rfind('}') + 1
+        Args:
+            image_path: Path to the image file
+            
+        Returns:
+            Future resolving to the extraction result (or None)
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((image_path, future))
+        return future
+    
+    async def extract(self, image_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Extract financial data from an image, batched with concurrent calls.
         
-        if json_start != -1 and json_end > json_start:
-            content = content[json_start:json_end].strip()
-            logger.info(f"Extracted JSON portion: {len(content)} characters")
+        Args:
+            image_path: Path to the image file
+            
+        Returns:
+            Dictionary containing extracted financial data or None if extraction fails
+        """
+        return await self.submit(image_path)
+    
+    async def close(self):
+        """Stop the background flush task"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    async def _run(self):
+        """Pull queued calls into batches and resolve their futures"""
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_latency_ms / 1000
+            
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            image_paths = [image_path for image_path, _ in batch]
+            try:
+                results = await asyncio.to_thread(extract_from_images_batch, image_paths, self.max_batch_size)
+            except Exception as e:
+                logger.error("Error flushing extraction batch: %s", e)
+                results = [None] * len(batch)
+            
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+def _pdfium_page_range_text(pdf_path: Union[str, bytes], start: int, stop: int) -> List[str]:
+    """
+    Extract the text of pages [start, stop) of a PDF file with PDFium.
+    
+    Args:
+        pdf_path: Path to the PDF file, or its contents
+        start: Index of the first page to read
+        stop: Index one past the last page to read
         
-        # Parse JSON response
-        try:
-            extracted_data = json.loads(content)
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {e}")
-            logger.error(f"Response content: {content}")
-            return None
+    Returns:
+        List of page texts
+    """
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        page_texts = []
+        for page_index in range(start, stop):
+            page = pdf[page_index]
+            textpage = page.get_textpage()
+            page_texts.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+        return page_texts
+    finally:
+        pdf.close()
+
+@lru_cache(maxsize=1)
+def _get_pdf_executor() -> ProcessPoolExecutor:
+    """Process pool used to extract large PDFs page-range by page-range."""
+    # The app already runs threads by the time a PDF arrives, so workers
+    # come from a fork server rather than a fork of this process
+    return ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context('forkserver'))
+
+# A forked child (gunicorn worker) must not reuse the parent's pool
+os.register_at_fork(after_in_child=_get_pdf_executor.cache_clear)
+
+def _read_pdf_text_pdfium(pdf_path: Union[str, bytes]) -> str:
+    """
+    Extract the raw text content of a PDF file with PDFium.
+    
+    PDFium is not thread-safe, so large documents on disk are split into
+    page ranges that are extracted in parallel worker processes.
+    
+    Args:
+        pdf_path: Path to the PDF file, or its contents
         
-        # Validate extracted data
-        if not validate_extracted_data(extracted_data):
-            logger.error("Extracted data validation failed")
-            return None
+    Returns:
+        Extracted text content
+    """
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        page_count = min(len(pdf), MAX_PDF_PAGES)
+    finally:
+        pdf.close()
+    
+    if not isinstance(pdf_path, str) or page_count < PDF_PARALLEL_MIN_PAGES or PDF_WORKERS < 2:
+        return "\n".join(_pdfium_page_range_text(pdf_path, 0, page_count))
+    
+    # Pages are independent, so each worker reads a contiguous range
+    step = -(-page_count // PDF_WORKERS)
+    starts = range(0, page_count, step)
+    stops = [min(start + step, page_count) for start in starts]
+    
+    executor = _get_pdf_executor()
+    chunks = executor.map(_pdfium_page_range_text, [pdf_path] * len(starts), starts, stops)
+    return "\n".join(text for chunk in chunks for text in chunk)
+
+def _read_pdf_text_pypdf2(pdf_path: Union[str, bytes]) -> str:
+    """
+    Extract the raw text content of a PDF file with PyPDF2.
+    
+    Args:
+        pdf_path: Path to the PDF file, or its contents
         
-        # Add metadata
-        extracted_data['extraction_method'] = 'nvidia_nemotron'
-        extracted_data['source_file'] = image_path
+    Returns:
+        Extracted text content
+    """
+    with (io.BytesIO(pdf_path) if isinstance(pdf_path, bytes) else open(pdf_path, 'rb')) as file:
+        pdf_reader = PyPDF2.PdfReader(file)
         
-        logger.info(f"Successfully extracted data using NVIDIA Nemotron - Vendor: {extracted_data.get('vendor')}, Total: ${extracted_data.get('total')}")
-        return extracted_data
+        # Stop after MAX_PDF_PAGES so large documents are never fully parsed
+        pages = islice(pdf_reader.pages, MAX_PDF_PAGES)
+        return "\n".join(page.extract_text() or "" for page in pages)
+
+def _read_pdf_text(pdf_path: Union[str, bytes]) -> str:
+    """
+    Extract the raw text content of the first MAX_PDF_PAGES pages of a PDF
+    file, preferring the native PDFium backend and falling back to PyPDF2.
+    
+    Args:
+        pdf_path: Path to the PDF file, or its contents
         
-    except Exception as e:
-        logger.error(f"Error extracting data from image using NVIDIA API: {e}")
-        return None
+    Returns:
+        Extracted text content
+    """
+    if pdfium is not None:
+        try:
+            return _read_pdf_text_pdfium(pdf_path)
+        except Exception as e:
+            logger.warning("pypdfium2 failed to read %s, falling back to PyPDF2: %s",
+                           'uploaded file' if isinstance(pdf_path, bytes) else pdf_path, e)
+    
+    return _read_pdf_text_pypdf2(pdf_path)
+
+@lru_cache(maxsize=128)
+def _pdf_text(pdf_path: str, mtime: float, size: int) -> str:
+    """
+    Cached wrapper around _read_pdf_text; mtime and size are part of the
+    cache key so an edited or re-uploaded file is parsed again.
+    """
+    return _read_pdf_text(pdf_path)
 
-def extract_from_pdf(pdf_path: str) -> Optional[Dict[str, Any]]:
+def _pdf_text_for(pdf_path: str) -> str:
+    """Extract PDF text, reusing the cached result while the file is unchanged."""
+    st = os.stat(pdf_path)
+    return _pdf_text(pdf_path, st.st_mtime, st.st_size)
+
+def _read_text_file(file_path: str) -> str:
+    """Read an uploaded text file."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def extract_from_pdf(pdf_path: FileSource) -> Optional[Dict[str, Any]]:
     """
-    Extract financial data from PDF using PyPDF2 and NVIDIA Nemotron.
+    Extract financial data from PDF using pypdfium2 (or PyPDF2) and NVIDIA Nemotron.
     
     Args:
-        pdf_path: Path to the PDF file
+        pdf_path: Path to the PDF file, or an open binary file
         
     Returns:
         Dictionary containing extracted financial data or None if extraction fails
     """
     try:
-        # Check if file exists
-        if not os.path.exists(pdf_path):
-            logger.error(f"PDF file not found: {pdf_path}")
+        source_name = _source_name(pdf_path)
+        if source_name is None:
+            # Open files are parsed straight from their contents
+            text_content = _read_pdf_text(_read_source(pdf_path))
+        elif not os.path.exists(pdf_path):
+            logger.error("PDF file not found: %s", pdf_path)
             return None
-        
-        # Extract text from PDF
-        text_content = ""
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text_content += page.extract_text() + "\n"
+        else:
+            # Extract text from PDF
+            text_content = _pdf_text_for(pdf_path)
         
         if not text_content.strip():
             logger.error("No text content extracted from PDF")
             return None
         
-        logger.info(f"Extracted {len(text_content)} characters from PDF")
+        logger.info("Extracted %s characters from PDF", len(text_content))
         
         # Use text extraction function
         result = extract_from_text(text_content)
         
         if result:
             result['extraction_method'] = 'nvidia_pdf'
-            result['source_file'] = pdf_path
+            if source_name:
+                result['source_file'] = source_name
         
         return result
         
     except Exception as e:
-        logger.error(f"Error extracting data from PDF: {e}")
+        logger.error("Error extracting data from PDF: %s", e)
         return None
 
+def _text_request_kwargs(text_content: str) -> Dict[str, Any]:
+    """
+    Build chat completion arguments for receipt text analysis.
+    
+    Args:
+        text_content: Text content to analyze
+        
+    Returns:
+        Keyword arguments for chat.completions.create
+    """
+    # Prepare prompt for text analysis
+    text_prompt = TEXT_PROMPT_PREFIX + text_content
+    
+    return {
+        "model": NVIDIA_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": text_prompt
+            }
+        ],
+        "max_tokens": MAX_RESPONSE_TOKENS,
+        "temperature": 0.1,
+        "response_format": TEXT_RESPONSE_FORMAT
+    }
+
 def extract_from_text(text_content: str) -> Optional[Dict[str, Any]]:
     """
     Extract financial data from text content using NVIDIA Nemotron.
@@ -246,77 +1491,189 @@ def extract_from_text(text_content: str) -> Optional[Dict[str, Any]]:
         Dictionary containing extracted financial data or None if extraction fails
     """
     try:
+        if not text_content.strip():
+            logger.error("Empty text content provided")
+            return None
+        
+        # Templated receipts from well-known chains skip the API call entirely
+        result = extract_with_templates(text_content)
+        if result:
+            return result
+        
+        # Identical text skips the API call entirely; surrounding whitespace
+        # is not part of the key
+        key = _cache_key(text_content.strip().encode('utf-8'))
+        cached = _cache_get(key)
+        if cached:
+            return cached
+        
         # Get NVIDIA API client
         client = get_nvidia_client()
         if not client:
             return None
         
+        logger.info("Processing text with NVIDIA Nemotron")
+        
+        # Call NVIDIA API for text processing
+        content = _complete_validated(client, _text_request_kwargs(text_content))
+        return _postprocess_response(content, 'nvidia_text', cache_key=key)
+        
+    except Exception as e:
+        logger.error("Error extracting data from text using NVIDIA API: %s", e)
+        return None
+
+def process_uploaded_file(file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Process an uploaded file and extract financial data.
+    
+    Args:
+        file_path: Path to the uploaded file
+        
+    Returns:
+        Dictionary containing extracted financial data or None if extraction fails
+    """
+    path = Path(file_path)
+    if not path.is_file():
+        logger.error("File not found: %s", file_path)
+        return None
+    
+    # Get file extension
+    file_ext = path.suffix.lower().lstrip('.')
+    file_type = FILE_TYPES.get(file_ext)
+    
+    # Route to appropriate extraction function
+    if file_type == 'image':
+        logger.info("Processing image file: %s", file_path)
+        return extract_from_image(file_path)
+    elif file_type == 'pdf':
+        logger.info("Processing PDF file: %s", file_path)
+        return extract_from_pdf(file_path)
+    elif file_type == 'text':
+        logger.info("Processing text file: %s", file_path)
+        return extract_from_text(_read_text_file(file_path))
+    else:
+        logger.error("Unsupported file format: %s", file_ext)
+        return None
+
+async def extract_from_image_async(image_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Async variant of extract_from_image using the shared AsyncOpenAI client.
+    
+    Args:
+        image_path: Path to the image file
+        
+    Returns:
+        Dictionary containing extracted financial data or None if extraction fails
+    """
+    try:
+        image_paths = [image_path]
+        
+        # Reading and encoding the image is blocking file I/O
+        results, blocks, positions, cache_keys = await asyncio.to_thread(_prepare_batch, image_paths)
+        if not blocks:
+            return results[0]
+        
+        # Get NVIDIA API client
+        client = get_async_nvidia_client()
+        if not client:
+            return None
+        
+        logger.info("Processing image with NVIDIA Nemotron: %s", image_path)
+        
+        content = await _complete_validated_async(client, _batch_request_kwargs(blocks))
+        result = _fan_out_batch(content, image_paths, positions, cache_keys, results)[0]
+        
+    except Exception as e:
+        logger.error("Error extracting data from image using NVIDIA API: %s", e)
+        result = None
+    
+    if result is None:
+        # OCR is CPU-bound, keep it off the event loop
+        result = await asyncio.to_thread(extract_with_ocr, image_path)
+    
+    return result
+
+async def extract_from_text_async(text_content: str) -> Optional[Dict[str, Any]]:
+    """
+    Async variant of extract_from_text using the shared AsyncOpenAI client.
+    
+    Args:
+        text_content: Text content to analyze
+        
+    Returns:
+        Dictionary containing extracted financial data or None if extraction fails
+    """
+    try:
         if not text_content.strip():
             logger.error("Empty text content provided")
             return None
         
-        # Prepare prompt for text analysis
-        text_prompt = f"{EXTRACTION_PROMPT}\n\nReceipt text to analyze:\n{text_content}"
-        
-        logger.info("Processing text with NVIDIA Nemotron")
+        # Templated receipts from well-known chains skip the API call entirely
+        result = extract_with_templates(text_content)
+        if result:
+            return result
         
-        # Call NVIDIA API for text processing
-        response = client.chat.completions.create(
-            model=NVIDIA_MODEL,
-            messages=[
-                {
-                    "role": "user",
-                    "content": text_prompt
-                }
-            ],
-            max_tokens=1000,
-            temperature=0.1
-        )
+        # Identical text skips the API call entirely; surrounding whitespace
+        # is not part of the key
+        key = _cache_key(text_content.strip().encode('utf-8'))
+        cached = _cache_get(key)
+        if cached:
+            return cached
         
-        # Extract response content
-        content = response.choices[0].message.content.strip()
-        logger.info(f"NVIDIA API text response received: {len(content)} characters")
+        # Get NVIDIA API client
+        client = get_async_nvidia_client()
+        if not client:
+            return None
         
-        # Clean up response (remove markdown and extract JSON)
-        if content.startswith('```json'):
-            content = content.replace('```json', '').replace('```', '').strip()
-        elif content.startswith('```'):
-            content = content.replace('```', '').strip()
+        logger.info("Processing text with NVIDIA Nemotron")
         
-        # Extract JSON from response if it contains extra text
-        json_start = content.find('{')
-        json_end = content.rfind('}') + 1
+        content = await _complete_validated_async(client, _text_request_kwargs(text_content))
+        return _postprocess_response(content, 'nvidia_text', cache_key=key)
         
-        if json_start != -1 and json_end > json_start:
-            content = content[json_start:json_end].strip()
-            logger.info(f"Extracted JSON portion: {len(content)} characters")
+    except Exception as e:
+        logger.error("Error extracting data from text using NVIDIA API: %s", e)
+        return None
+
+async def extract_from_pdf_async(pdf_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Async variant of extract_from_pdf; PDF parsing runs in a worker thread.
+    
+    Args:
+        pdf_path: Path to the PDF file
         
-        # Parse JSON response
-        try:
-            extracted_data = json.loads(content)
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {e}")
-            logger.error(f"Response content: {content}")
+    Returns:
+        Dictionary containing extracted financial data or None if extraction fails
+    """
+    try:
+        # Check if file exists
+        if not os.path.exists(pdf_path):
+            logger.error("PDF file not found: %s", pdf_path)
             return None
         
-        # Validate extracted data
-        if not validate_extracted_data(extracted_data):
-            logger.error("Extracted data validation failed")
+        # PDF parsing is synchronous, keep it off the event loop
+        text_content = await asyncio.to_thread(_pdf_text_for, pdf_path)
+        
+        if not text_content.strip():
+            logger.error("No text content extracted from PDF")
             return None
         
-        # Add metadata
-        extracted_data['extraction_method'] = 'nvidia_text'
+        logger.info("Extracted %s characters from PDF", len(text_content))
+        
+        result = await extract_from_text_async(text_content)
+        
+        if result:
+            result['extraction_method'] = 'nvidia_pdf'
+            result['source_file'] = pdf_path
         
-        logger.info(f"Successfully extracted data from text using NVIDIA Nemotron - Vendor: {extracted_data.get('vendor')}, Total: ${extracted_data.get('total')}")
-        return extracted_data
+        return result
         
     except Exception as e:
-        logger.error(f"Error extracting data from text using NVIDIA API: {e}")
+        logger.error("Error extracting data from PDF: %s", e)
         return None
 
-def process_uploaded_file(file_path: str) -> Optional[Dict[str, Any]]:
+async def process_uploaded_file_async(file_path: str) -> Optional[Dict[str, Any]]:
     """
-    Process an uploaded file and extract financial data.
+    Async variant of process_uploaded_file.
     
     Args:
         file_path: Path to the uploaded file
@@ -324,29 +1681,159 @@ def process_uploaded_file(file_path: str) -> Optional[Dict[str, Any]]:
     Returns:
         Dictionary containing extracted financial data or None if extraction fails
     """
-    if not os.path.exists(file_path):
-        logger.error(f"File not found: {file_path}")
+    path = Path(file_path)
+    if not path.is_file():
+        logger.error("File not found: %s", file_path)
         return None
     
     # Get file extension
-    file_ext = file_path.lower().split('.')[-1]
+    file_ext = path.suffix.lower().lstrip('.')
+    file_type = FILE_TYPES.get(file_ext)
     
     # Route to appropriate extraction function
-    if file_ext in ['jpg', 'jpeg', 'png', 'gif', 'webp']:
-        logger.info(f"Processing image file: {file_path}")
-        return extract_from_image(file_path)
-    elif file_ext == 'pdf':
-        logger.info(f"Processing PDF file: {file_path}")
-        return extract_from_pdf(file_path)
-    elif file_ext in ['txt', 'text']:
-        logger.info(f"Processing text file: {file_path}")
-        with open(file_path, 'r', encoding='utf-8') as f:
-            text_content = f.read()
-        return extract_from_text(text_content)
+    if file_type == 'image':
+        logger.info("Processing image file: %s", file_path)
+        return await extract_from_image_async(file_path)
+    elif file_type == 'pdf':
+        logger.info("Processing PDF file: %s", file_path)
+        return await extract_from_pdf_async(file_path)
+    elif file_type == 'text':
+        logger.info("Processing text file: %s", file_path)
+        text_content = await asyncio.to_thread(_read_text_file, file_path)
+        return await extract_from_text_async(text_content)
     else:
-        logger.error(f"Unsupported file format: {file_ext}")
+        logger.error("Unsupported file format: %s", file_ext)
         return None
 
+async def extract_from_images_pipeline(image_paths: List[str], max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+                                       semaphore: Optional[asyncio.Semaphore] = None) -> List[Optional[Dict[str, Any]]]:
+    """
+    Extract financial data from many images with a three-stage pipeline:
+    decode/resize in worker threads, NVIDIA requests, then parse/validate.
+    
+    Stages are connected by bounded queues, so decoding the next images
+    overlaps with waiting on the API without buffering every image at once.
+    
+    Args:
+        image_paths: Paths to the image files
+        max_concurrency: Maximum number of NVIDIA requests in flight
+        semaphore: Optional semaphore shared with other requests in flight
+        
+    Returns:
+        List with one extraction result (or None) per input path, in order
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(image_paths)
+    client = get_async_nvidia_client()
+    
+    pending: asyncio.Queue = asyncio.Queue()
+    for item in enumerate(image_paths):
+        pending.put_nowait(item)
+    decoded: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    responses: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    semaphore = semaphore or asyncio.Semaphore(max(1, max_concurrency))
+    
+    async def _decode_stage() -> None:
+        while True:
+            try:
+                index, image_path = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                prepared, blocks, _, cache_keys = await asyncio.to_thread(_prepare_batch, [image_path])
+            except Exception as e:
+                logger.error("Error preparing image %s: %s", image_path, e)
+                continue
+            if blocks and client:
+                await decoded.put((index, blocks, cache_keys))
+            else:
+                # Cache hit, unreadable image or no client
+                results[index] = prepared[0]
+    
+    async def _request_stage() -> None:
+        while True:
+            item = await decoded.get()
+            if item is None:
+                return
+            index, blocks, cache_keys = item
+            logger.info("Processing image with NVIDIA Nemotron: %s", image_paths[index])
+            try:
+                async with semaphore:
+                    content = await _complete_validated_async(client, _batch_request_kwargs(blocks))
+            except Exception as e:
+                logger.error("Error extracting data from image using NVIDIA API: %s", e)
+                continue
+            await responses.put((index, cache_keys, content))
+    
+    async def _parse_stage() -> None:
+        while True:
+            item = await responses.get()
+            if item is None:
+                return
+            index, cache_keys, content = item
+            results[index] = _fan_out_batch(content, [image_paths[index]], [0], cache_keys, [None])[0]
+    
+    decoders = [asyncio.create_task(_decode_stage()) for _ in range(PIPELINE_DECODE_WORKERS)]
+    requesters = [asyncio.create_task(_request_stage()) for _ in range(max(1, max_concurrency))]
+    parser = asyncio.create_task(_parse_stage())
+    try:
+        # Drain each stage in turn, then tell the next one there is no more work
+        await asyncio.gather(*decoders)
+        for _ in requesters:
+            await decoded.put(None)
+        await asyncio.gather(*requesters)
+        await responses.put(None)
+        await parser
+    finally:
+        for task in decoders + requesters + [parser]:
+            task.cancel()
+    
+    # Fall back to local OCR for any image the vision model could not read
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = await asyncio.to_thread(extract_with_ocr, image_paths[index])
+    
+    return results
+
+async def process_uploaded_files(file_paths: List[str], max_concurrency: int = MAX_CONCURRENT_REQUESTS) -> List[Optional[Dict[str, Any]]]:
+    """
+    Process several uploaded files concurrently.
+    
+    Args:
+        file_paths: Paths to the uploaded files
+        max_concurrency: Maximum number of NVIDIA requests in flight
+        
+    Returns:
+        List with one extraction result (or None) per input path, in order
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    
+    async def _process_one(file_path: str) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            try:
+                return await process_uploaded_file_async(file_path)
+            except Exception as e:
+                logger.error("Error processing file %s: %s", file_path, e)
+                return None
+    
+    # Images go through the staged pipeline; PDFs and text files are handled
+    # one by one, all sharing the same request budget
+    image_indices = [index for index, file_path in enumerate(file_paths)
+                     if FILE_TYPES.get(Path(file_path).suffix.lower().lstrip('.')) == 'image']
+    image_set = set(image_indices)
+    other_indices = [index for index in range(len(file_paths)) if index not in image_set]
+    
+    image_results, other_results = await asyncio.gather(
+        extract_from_images_pipeline([file_paths[index] for index in image_indices], max_concurrency, semaphore),
+        asyncio.gather(*(_process_one(file_paths[index]) for index in other_indices))
+    )
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(file_paths)
+    for index, result in zip(image_indices, image_results):
+        results[index] = result
+    for index, result in zip(other_indices, other_results):
+        results[index] = result
+    return results
+
 def test_extraction():
     """Test function to verify the extraction functionality."""
     print("Testing NVIDIA Nemotron AI extraction functions...")
@@ -376,7 +1863,7 @@ def test_extraction():
     result = extract_from_text(sample_text)
     if result:
         print("✓ NVIDIA Nemotron text extraction successful")
-        print(json.dumps(result, indent=2))
+        print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
     else:
         print("✗ NVIDIA Nemotron text extraction failed")
 
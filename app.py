@@ -1,9 +1,23 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash
+from flask import Flask, Request, render_template, request, redirect, url_for, jsonify, flash
 import os
+import io
 import json
-from datetime import datetime
+import argparse
+import asyncio
+import codecs
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Optional, Union
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
+from flask.json.provider import JSONProvider, _default
+from flask_compress import Compress
+import orjson
+import msgspec
 import ai_extractor
 import database
 import rag_engine
@@ -11,13 +25,100 @@ import rag_engine
 # Load environment variables
 load_dotenv()
 
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson; falls back to Flask's default for unsupported types"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        # The session serializer passes object_hook to untag tuples, dates
+        # etc., which orjson doesn't support
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round trip of the base implementation
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_NON_STR_KEYS
+        if self._app.debug:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(orjson.dumps(obj, default=_default, option=option), mimetype='application/json')
+
+# Uploads up to this size stay in memory; larger ones roll over to a temp file
+UPLOAD_SPOOL_SIZE = 4 << 20  # 4 MiB
+
+class SpoolingRequest(Request):
+    """Request that spools uploaded files in memory up to UPLOAD_SPOOL_SIZE"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE, mode='rb+')
+
 app = Flask(__name__)
+app.request_class = SpoolingRequest
+app.json = OrjsonProvider(app)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-# Allowed file extensions
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'txt'}
+# Compress JSON and HTML responses for clients that accept gzip/br
+app.config['COMPRESS_MIMETYPES'] = ['application/json', 'text/html']
+app.config['COMPRESS_LEVEL'] = 5
+app.config['COMPRESS_MIN_SIZE'] = 1024
+Compress(app)
+
+# Extraction runs on a shared pool so slow NVIDIA calls are bounded by a timeout
+EXECUTOR = ThreadPoolExecutor(max_workers=8)
+EXTRACTION_TIMEOUT = 120  # seconds
+
+# Long-lived event loop for async extraction; the async NVIDIA client's
+# connection pool is tied to the loop it was first used on, so every request
+# must run on this one loop rather than a fresh asyncio.run() loop
+EVENT_LOOP = None
+
+def start_event_loop():
+    """Start the shared extraction event loop on a daemon thread"""
+    global EVENT_LOOP
+    EVENT_LOOP = asyncio.new_event_loop()
+    threading.Thread(target=EVENT_LOOP.run_forever, name='extraction-loop', daemon=True).start()
+
+start_event_loop()
+
+# A worker forked from a preloaded app (gunicorn preload_app) inherits the
+# loop but not the thread running it, so it gets a loop of its own
+os.register_at_fork(after_in_child=start_event_loop)
+
+# Buffer size used when writing uploads to disk
+UPLOAD_BUFFER_SIZE = 1 << 20  # 1 MiB
+
+# Columns shown on the transactions list; details come from get_transaction
+TRANSACTION_LIST_COLUMNS = ('id', 'vendor', 'date', 'amount', 'category', 'confidence_score', 'payment_method', 'timestamp')
+TRANSACTIONS_PAGE_SIZE = 50
+MAX_TRANSACTIONS_PAGE_SIZE = 200
+
+# Columns a search hit needs; the stored summary and item count stand in for
+# the items list and raw data
+SEARCH_RESULT_COLUMNS = (
+    'id', 'vendor', 'date', 'amount', 'category', 'subtotal', 'tax', 'payment_method',
+    'confidence_score', 'timestamp', 'flagged', 'display_summary', 'items_count'
+)
+
+# Most queries one /api/search/batch request may carry
+MAX_BATCH_QUERIES = 32
+
+# Header bytes read to tell the actual file type from the claimed one
+SNIFF_BYTES = 16
+CONTENT_MISMATCH_ERROR = 'File contents do not look like a JPG, PNG, PDF, or TXT file.'
+
+# Extraction fields returned by the upload routes
+UPLOAD_RESPONSE_FIELDS = (
+    'vendor', 'date', 'total', 'category', 'subtotal', 'tax', 'payment_method',
+    'confidence_score', 'items', 'extraction_method'
+)
+
+# Allowed file extensions and the extraction route for each
+EXTENSION_TYPES = {'png': 'image', 'jpg': 'image', 'jpeg': 'image', 'gif': 'image', 'pdf': 'pdf', 'txt': 'text'}
 
 # Create uploads directory if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -30,33 +131,261 @@ except Exception as e:
     app.logger.error(f"Failed to initialize database: {e}")
     raise
 
-# Initialize RAG engine
-try:
-    rag_engine.initialize_rag_engine()
-    app.logger.info("RAG engine initialized successfully")
-except Exception as e:
-    app.logger.warning(f"Failed to initialize RAG engine: {e}")
-    # Don't raise - RAG is optional functionality
+# Load the RAG engine in the background so the embedding model doesn't hold
+# up startup; gunicorn.conf.py defers this to each worker's post_fork hook
+if not os.getenv('LUMEN_DEFER_RAG_INIT'):
+    rag_engine.warm_up_rag_engine()
+    app.logger.info("RAG engine warm-up started")
 
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# Create the NVIDIA clients now so the first upload doesn't pay for it
+if ai_extractor.get_nvidia_client() and ai_extractor.get_async_nvidia_client():
+    app.logger.info("NVIDIA API clients initialized successfully")
+else:
+    app.logger.warning("NVIDIA API clients unavailable - set NVIDIA_API_KEY and restart to enable uploads")
 
-def get_file_type(filename):
-    """Determine file type based on extension"""
+def classify(filename):
+    """Return the file type ('image', 'pdf' or 'text') for an allowed filename, else None"""
     if not filename:
         return None
     
-    ext = filename.rsplit('.', 1)[1].lower()
-    if ext in ['jpg', 'jpeg', 'png', 'gif']:
-        return 'image'
-    elif ext == 'pdf':
+    return EXTENSION_TYPES.get(os.path.splitext(filename)[1][1:].lower())
+
+def sniff(head):
+    """Return the file type ('image', 'pdf' or 'text') that a file's first bytes show, else None"""
+    if head.startswith(b'%PDF-'):
         return 'pdf'
-    elif ext == 'txt':
-        return 'text'
-    else:
+    if head.startswith((b'\xff\xd8\xff', b'\x89PNG', b'GIF8')):
+        return 'image'
+    
+    # Anything else must be UTF-8 text; a multi-byte character cut off at
+    # the end of the header is fine
+    if head and b'\x00' not in head:
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(head)
+            return 'text'
+        except UnicodeDecodeError:
+            pass
+    return None
+
+def sniff_stream(stream):
+    """Sniff the file type of an open upload, leaving it positioned at the start"""
+    stream.seek(0)
+    head = stream.read(SNIFF_BYTES)
+    stream.seek(0)
+    return sniff(head)
+
+def run_async(coro):
+    """Run a coroutine on the shared extraction event loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, EVENT_LOOP).result()
+
+def upload_fileno(stream):
+    """Return the OS file descriptor behind an upload stream, or None if it is held in memory"""
+    # Werkzeug spools small uploads in memory; calling fileno() on a
+    # SpooledTemporaryFile would force them onto disk first
+    if not getattr(stream, '_rolled', True) or not hasattr(os, 'sendfile'):
+        return None
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+def save_upload(file, file_path):
+    """Write an uploaded file to disk, copying in the kernel when the upload is already on disk"""
+    stream = file.stream
+    with open(file_path, 'wb') as out:
+        in_fd = upload_fileno(stream)
+        if in_fd is not None:
+            offset = stream.tell()
+            remaining = os.fstat(in_fd).st_size - offset
+            while remaining > 0:
+                sent = os.sendfile(out.fileno(), in_fd, offset, remaining)
+                if sent == 0:
+                    break
+                offset += sent
+                remaining -= sent
+        else:
+            shutil.copyfileobj(stream, out, UPLOAD_BUFFER_SIZE)
+
+def extract_file(source, file_type):
+    """Extract data from an upload (a saved path or an open binary file) using the AI function for its type"""
+    if file_type == 'image':
+        return ai_extractor.extract_from_image(source)
+    elif file_type == 'pdf':
+        return ai_extractor.extract_from_pdf(source)
+    elif file_type == 'text':
+        if hasattr(source, 'read'):
+            source.seek(0)
+            text_content = source.read().decode('utf-8')
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                text_content = f.read()
+        return ai_extractor.extract_from_text(text_content)
+    return None
+
+class Receipt(msgspec.Struct):
+    """Extracted receipt fields stored as transaction columns; other keys are ignored"""
+    vendor: Optional[str] = ''
+    date: Optional[str] = ''
+    total: Optional[float] = 0
+    category: Optional[str] = 'other'
+    items: Optional[list] = []
+    subtotal: Optional[float] = 0
+    tax: Optional[float] = 0
+    payment_method: Optional[str] = 'unknown'
+    confidence_score: Optional[Union[int, float]] = 0
+
+def transaction_record(extracted_data, flagged=0):
+    """Map extracted data to the fields stored in the transactions table"""
+    # Validate and coerce in one pass, e.g. "4.29" -> 4.29; wrongly typed
+    # model output raises msgspec.ValidationError
+    receipt = msgspec.convert(extracted_data, Receipt, strict=False)
+    return {
+        'vendor': receipt.vendor,
+        'date': receipt.date,
+        'amount': receipt.total,
+        'category': receipt.category,
+        'items_json': receipt.items,
+        'subtotal': receipt.subtotal,
+        'tax': receipt.tax,
+        'payment_method': receipt.payment_method,
+        'raw_data_json': extracted_data,
+        'confidence_score': receipt.confidence_score,
+        'flagged': int(flagged)
+    }
+
+def queue_for_vector_db(transaction_id, extracted_data):
+    """Queue a saved transaction for the vector database writer, which adds uploads in batches"""
+    try:
+        rag_engine.enqueue_for_vector_db(
+            transaction_id=transaction_id,
+            vendor=extracted_data.get('vendor', ''),
+            category=extracted_data.get('category', ''),
+            items_json=extracted_data.get('items', []),
+            date=extracted_data.get('date', ''),
+            amount=extracted_data.get('total', 0)
+        )
+        app.logger.info(f"Queued transaction {transaction_id} for vector database")
+    except Exception as e:
+        app.logger.warning(f"Failed to queue transaction {transaction_id} for vector database: {e}")
+        # Don't fail the request if RAG fails
+
+def save_extracted_transaction(extracted_data, flagged=0):
+    """Save extracted data to the database and vector store, returning the transaction ID"""
+    try:
+        transaction_data = transaction_record(extracted_data, flagged)
+    except msgspec.ValidationError as e:
+        app.logger.error(f"Extracted data failed validation: {e}")
+        return None
+    
+    # Save to database
+    transaction_id = database.save_transaction(transaction_data)
+    if not transaction_id:
         return None
+    
+    queue_for_vector_db(transaction_id, extracted_data)
+    return transaction_id
+
+def save_extracted_transactions(extractions, flags):
+    """Save several extractions in one database transaction, returning their IDs in order (None where invalid)"""
+    valid = []
+    for position, (extracted_data, flagged) in enumerate(zip(extractions, flags)):
+        try:
+            valid.append((position, transaction_record(extracted_data, flagged)))
+        except msgspec.ValidationError as e:
+            app.logger.error(f"Extracted data failed validation: {e}")
+    
+    transaction_ids = [None] * len(extractions)
+    saved_ids = database.save_transactions([record for _, record in valid])
+    for (position, _), transaction_id in zip(valid, saved_ids):
+        transaction_ids[position] = transaction_id
+        queue_for_vector_db(transaction_id, extractions[position])
+    
+    return transaction_ids
+
+def upload_response_data(extracted_data, transaction_id, filename):
+    """Build the upload response from the fields the client shows, instead of copying the whole extraction"""
+    response_data = {field: extracted_data.get(field) for field in UPLOAD_RESPONSE_FIELDS}
+    response_data['transaction_id'] = transaction_id
+    response_data['original_filename'] = filename
+    return response_data
+
+def detach_upload_stream(file):
+    """Take the stream out of an uploaded file so closing the request doesn't close it; the caller must close it"""
+    stream = file.stream
+    file.stream = io.BytesIO()
+    return stream
+
+def process_upload(source, filename, file_type):
+    """Extract and store an upload held in an open binary file, returning the JSON response; closes the file when done"""
+    # Extract data using appropriate AI function on the shared pool. After a
+    # timeout the worker can still be reading the upload when the response
+    # is sent, so the file is closed when extraction finishes, not before
+    future = EXECUTOR.submit(extract_file, source, file_type)
+    future.add_done_callback(lambda _: source.close())
+    try:
+        extracted_data = future.result(timeout=EXTRACTION_TIMEOUT)
+    except FuturesTimeoutError:
+        # Don't spend an API call on an upload that is still queued
+        future.cancel()
+        return jsonify({
+            'success': False,
+            'error': 'Extraction timed out. Please try again.'
+        }), 504
+    
+    # Check if extraction was successful
+    if not extracted_data:
+        return jsonify({
+            'success': False,
+            'error': 'Failed to extract data from file. Please try a different file or check if it contains receipt/invoice information.'
+        }), 400
+    
+    # Save to database and vector store, flagging totals that don't add up
+    flagged = ai_extractor.check_totals([extracted_data])[0]
+    transaction_id = save_extracted_transaction(extracted_data, flagged)
+    
+    if not transaction_id:
+        return jsonify({
+            'success': False,
+            'error': 'Failed to save transaction to database'
+        }), 500
+    
+    # Prepare response data
+    response_data = upload_response_data(extracted_data, transaction_id, filename)
+    
+    return jsonify({
+        'success': True,
+        'message': 'File processed successfully',
+        'data': response_data
+    })
+
+def process_upload_job(job_id, file_path, file_type):
+    """Background worker: extract, store and clean up an upload, recording progress on its job"""
+    try:
+        database.update_job(job_id, 'processing')
+        
+        extracted_data = extract_file(file_path, file_type)
+        if not extracted_data:
+            database.update_job(job_id, 'failed', error='Failed to extract data from file')
+            return
+        
+        flagged = ai_extractor.check_totals([extracted_data])[0]
+        transaction_id = save_extracted_transaction(extracted_data, flagged)
+        if not transaction_id:
+            database.update_job(job_id, 'failed', error='Failed to save transaction to database')
+            return
+        
+        database.update_job(job_id, 'done', transaction_id=transaction_id)
+        app.logger.info(f"Job {job_id} finished with transaction {transaction_id}")
+    
+    except Exception as e:
+        app.logger.error(f"Error processing job {job_id}: {str(e)}")
+        database.update_job(job_id, 'failed', error=str(e))
+    
+    finally:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
 
 @app.route('/')
 def home():
@@ -87,139 +416,237 @@ def upload():
             }), 400
         
         # Check if file type is allowed
-        if not allowed_file(file.filename):
+        if not classify(file.filename):
             return jsonify({
                 'success': False,
                 'error': 'File type not supported. Please upload JPG, PNG, PDF, or TXT files.'
             }), 400
         
-        # Secure the filename and save file
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-        unique_filename = timestamp + filename
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        
-        file.save(file_path)
-        
-        # Detect file type
-        file_type = get_file_type(filename)
+        # The header, not the extension, picks the extractor
+        file_type = sniff_stream(file.stream)
         if not file_type:
-            # Clean up uploaded file on file type error
-            try:
-                os.remove(file_path)
-            except:
-                pass
             return jsonify({
                 'success': False,
-                'error': 'Unable to determine file type'
+                'error': CONTENT_MISMATCH_ERROR
             }), 400
         
-        # Extract data using appropriate AI function
-        extracted_data = None
+        filename = secure_filename(file.filename)
         
-        if file_type == 'image':
-            extracted_data = ai_extractor.extract_from_image(file_path)
-        elif file_type == 'pdf':
-            extracted_data = ai_extractor.extract_from_pdf(file_path)
-        elif file_type == 'text':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text_content = f.read()
-            extracted_data = ai_extractor.extract_from_text(text_content)
+        # Hand the file to a background worker when the client asks for it
+        # and poll /jobs/<id> instead of waiting on the AI call. The worker
+        # outlives the request, so the upload is saved to disk for it
+        if request.values.get('async') in ('1', 'true'):
+            timestamp = time.strftime('%Y%m%d_%H%M%S_')
+            unique_filename = timestamp + filename
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+            save_upload(file, file_path)
+            
+            job_id = database.create_job(filename)
+            EXECUTOR.submit(process_upload_job, job_id, file_path, file_type)
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'status': 'pending'
+            }), 202
         
-        # Check if extraction was successful
-        if not extracted_data:
-            # Clean up uploaded file on extraction failure
-            try:
+        # Otherwise extract straight from the spooled upload, which small
+        # files never leave memory for
+        return process_upload(detach_upload_stream(file), filename, file_type)
+        
+    except Exception as e:
+        # Clean up uploaded file on any unexpected error
+        try:
+            if 'file_path' in locals() and os.path.exists(file_path):
                 os.remove(file_path)
-            except:
-                pass
+        except:
+            pass
+        
+        app.logger.error(f"Error processing upload: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'An error occurred while processing the file: {str(e)}'
+        }), 500
+
+@app.route('/upload_stream', methods=['POST'])
+def upload_stream():
+    """Upload route that streams a raw request body into a spooled buffer; the filename comes from the X-Filename header"""
+    original_filename = request.headers.get('X-Filename', '')
+    if not original_filename:
+        return jsonify({
+            'success': False,
+            'error': 'No filename provided (X-Filename header)'
+        }), 400
+    
+    # Check if file type is allowed
+    if not classify(original_filename):
+        return jsonify({
+            'success': False,
+            'error': 'File type not supported. Please upload JPG, PNG, PDF, or TXT files.'
+        }), 400
+    
+    try:
+        filename = secure_filename(original_filename)
+        
+        # Copy the body in 1 MiB chunks without the multipart parser; bodies
+        # up to UPLOAD_SPOOL_SIZE stay in memory
+        spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+        try:
+            shutil.copyfileobj(request.stream, spool, UPLOAD_BUFFER_SIZE)
+            
+            # The header, not the extension, picks the extractor
+            file_type = sniff_stream(spool)
+        except Exception:
+            spool.close()
+            raise
+        
+        if not file_type:
+            spool.close()
             return jsonify({
                 'success': False,
-                'error': 'Failed to extract data from file. Please try a different file or check if it contains receipt/invoice information.'
+                'error': CONTENT_MISMATCH_ERROR
             }), 400
         
-        # Prepare data for database
-        transaction_data = {
-            'vendor': extracted_data.get('vendor', ''),
-            'date': extracted_data.get('date', ''),
-            'amount': extracted_data.get('total', 0),
-            'category': extracted_data.get('category', 'other'),
-            'items_json': extracted_data.get('items', []),
-            'subtotal': extracted_data.get('subtotal', 0),
-            'tax': extracted_data.get('tax', 0),
-            'payment_method': extracted_data.get('payment_method', 'unknown'),
-            'raw_data_json': extracted_data,
-            'confidence_score': extracted_data.get('confidence_score', 0),
-            'flagged': 0
-        }
+        # process_upload closes the spool once extraction is done, which can
+        # be after this response when it times out
+        return process_upload(spool, filename, file_type)
         
-        # Save to database
-        transaction_id = database.save_transaction(transaction_data)
+    except Exception as e:
+        # Let Flask turn HTTP errors such as 413 into their usual responses
+        if isinstance(e, HTTPException):
+            raise
         
-        if not transaction_id:
-            # Clean up uploaded file on database error
+        app.logger.error(f"Error processing streamed upload: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'An error occurred while processing the file: {str(e)}'
+        }), 500
+
+@app.route('/upload_batch', methods=['POST'])
+def upload_batch():
+    """Upload route for extracting several files concurrently"""
+    files = [f for f in request.files.getlist('files') if f.filename]
+    if not files:
+        return jsonify({
+            'success': False,
+            'error': 'No files provided'
+        }), 400
+    
+    results = []
+    saved = []
+    try:
+        # Save every supported file first so extraction can run concurrently
+        timestamp = time.strftime('%Y%m%d_%H%M%S_')
+        for index, file in enumerate(files):
+            filename = secure_filename(file.filename)
+            if not classify(filename):
+                results.append({
+                    'success': False,
+                    'original_filename': filename,
+                    'error': 'File type not supported. Please upload JPG, PNG, PDF, or TXT files.'
+                })
+                continue
+            
+            # The batch extractor routes by extension, so it has to agree
+            # with what the file actually contains
+            if sniff_stream(file.stream) != classify(filename):
+                results.append({
+                    'success': False,
+                    'original_filename': filename,
+                    'error': CONTENT_MISMATCH_ERROR
+                })
+                continue
+            
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}{index}_{filename}")
+            save_upload(file, file_path)
+            saved.append((len(results), filename, file_path))
+            results.append(None)
+        
+        # Extract data from all files with bounded concurrency
+        extracted = run_async(ai_extractor.process_uploaded_files([path for _, _, path in saved]))
+        
+        succeeded = []
+        for (position, filename, _), extracted_data in zip(saved, extracted):
+            if not extracted_data:
+                results[position] = {
+                    'success': False,
+                    'original_filename': filename,
+                    'error': 'Failed to extract data from file.'
+                }
+                continue
+            succeeded.append((position, filename, extracted_data))
+        
+        # Check totals and save the whole batch at once
+        extractions = [extracted_data for _, _, extracted_data in succeeded]
+        flags = ai_extractor.check_totals(extractions)
+        transaction_ids = save_extracted_transactions(extractions, flags)
+        
+        for (position, filename, extracted_data), transaction_id in zip(succeeded, transaction_ids):
+            if not transaction_id:
+                results[position] = {
+                    'success': False,
+                    'original_filename': filename,
+                    'error': 'Failed to save transaction to database'
+                }
+                continue
+            
+            response_data = upload_response_data(extracted_data, transaction_id, filename)
+            results[position] = {
+                'success': True,
+                'data': response_data
+            }
+        
+        processed = sum(1 for result in results if result['success'])
+        return jsonify({
+            'success': processed > 0,
+            'message': f'Processed {processed} of {len(results)} files',
+            'results': results
+        })
+        
+    except Exception as e:
+        app.logger.error(f"Error processing batch upload: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'An error occurred while processing the files: {str(e)}'
+        }), 500
+    
+    finally:
+        # Clean up uploaded files whatever the outcome
+        for _, _, file_path in saved:
             try:
                 os.remove(file_path)
-            except:
+            except OSError:
                 pass
+
+@app.route('/jobs/<int:job_id>')
+def get_job(job_id):
+    """Get the status of a background upload job"""
+    try:
+        job = database.get_job(job_id)
+        
+        if not job:
             return jsonify({
                 'success': False,
-                'error': 'Failed to save transaction to database'
-            }), 500
-        
-        # Add to vector database for semantic search
-        try:
-            rag_engine.add_transaction_to_vector_db(
-                transaction_id=transaction_id,
-                vendor=extracted_data.get('vendor', ''),
-                category=extracted_data.get('category', ''),
-                items_json=extracted_data.get('items', []),
-                date=extracted_data.get('date', ''),
-                amount=extracted_data.get('total', 0)
-            )
-            app.logger.info(f"Added transaction {transaction_id} to vector database")
-        except Exception as e:
-            app.logger.warning(f"Failed to add transaction {transaction_id} to vector database: {e}")
-            # Don't fail the request if RAG fails
-        
-        # Clean up uploaded file after successful processing
-        try:
-            os.remove(file_path)
-            app.logger.info(f"Cleaned up temporary file: {file_path}")
-        except Exception as cleanup_error:
-            app.logger.warning(f"Failed to clean up file {file_path}: {cleanup_error}")
-        
-        # Prepare response data
-        response_data = extracted_data.copy()
-        response_data['transaction_id'] = transaction_id
-        response_data['original_filename'] = filename
+                'error': 'Job not found'
+            }), 404
         
         return jsonify({
             'success': True,
-            'message': 'File processed successfully',
-            'data': response_data
+            'job': job
         })
         
     except Exception as e:
-        # Clean up uploaded file on any unexpected error
-        try:
-            if 'file_path' in locals() and os.path.exists(file_path):
-                os.remove(file_path)
-        except:
-            pass
-        
-        app.logger.error(f"Error processing upload: {str(e)}")
+        app.logger.error(f"Error getting job {job_id}: {str(e)}")
         return jsonify({
             'success': False,
-            'error': f'An error occurred while processing the file: {str(e)}'
+            'error': f'Error getting job: {str(e)}'
         }), 500
 
 @app.route('/preview/<int:transaction_id>')
 def preview_transaction(transaction_id):
     """Preview route to display transaction data in a nice card format"""
     try:
-        # Retrieve transaction from database
-        transaction = database.get_transaction(transaction_id)
+        # Retrieve transaction from database, minus the raw data it doesn't show
+        transaction = database.get_transaction_summary(transaction_id)
         
         if not transaction:
             flash('Transaction not found', 'error')
@@ -250,10 +677,25 @@ def preview_transaction(transaction_id):
 
 @app.route('/transactions')
 def transactions():
-    """Route to display all transactions"""
+    """Route to display transactions a page at a time, newest first"""
     try:
-        all_transactions = database.get_all_transactions()
-        return render_template('transactions.html', transactions=all_transactions)
+        limit = min(max(request.args.get('limit', TRANSACTIONS_PAGE_SIZE, type=int), 1), MAX_TRANSACTIONS_PAGE_SIZE)
+        
+        # The cursor is "<timestamp>|<id>" of the last transaction already shown
+        before = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            timestamp, _, transaction_id = cursor.rpartition('|')
+            before = (timestamp, int(transaction_id))
+        
+        # Fetch one extra row to know whether there is another page
+        page = database.get_all_transactions(columns=TRANSACTION_LIST_COLUMNS, limit=limit + 1, before=before)
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = f"{page[-1]['timestamp']}|{page[-1]['id']}"
+        
+        return render_template('transactions.html', transactions=page, next_cursor=next_cursor, limit=limit)
     except Exception as e:
         app.logger.error(f"Error retrieving transactions: {str(e)}")
         flash('Error retrieving transactions', 'error')
@@ -271,9 +713,11 @@ def search():
             data = request.get_json()
             query = data.get('query', '').strip()
             k = data.get('k', 10)
+            ef_search = data.get('ef_search')
         else:
             query = request.form.get('query', '').strip()
             k = int(request.form.get('k', 10))
+            ef_search = request.form.get('ef_search', type=int)
         
         if not query:
             return jsonify({
@@ -282,15 +726,22 @@ def search():
             }), 400
         
         # Search for similar transactions using RAG
-        similar_transactions = rag_engine.get_similar_transactions(query, k)
+        similar_transactions = rag_engine.get_similar_transactions(query, k, ef_search=ef_search)
+        
+        # Get full transaction details for all results in a single query
+        transaction_ids = [similar_tx.get('transaction_id') for similar_tx in similar_transactions]
+        full_transactions = {
+            transaction['id']: transaction
+            for transaction in database.get_transactions_by_ids(
+                [tid for tid in transaction_ids if tid], columns=SEARCH_RESULT_COLUMNS
+            )
+        }
         
-        # Get full transaction details from database for each result
         detailed_results = []
         for similar_tx in similar_transactions:
             transaction_id = similar_tx.get('transaction_id')
             if transaction_id:
-                # Get full transaction details
-                full_transaction = database.get_transaction(transaction_id)
+                full_transaction = full_transactions.get(transaction_id)
                 if full_transaction:
                     # Combine RAG result with full transaction data
                     detailed_result = {
@@ -304,7 +755,8 @@ def search():
                         'payment_method': full_transaction['payment_method'] or 'unknown',
                         'confidence_score': full_transaction['confidence_score'] or 0,
                         'timestamp': full_transaction['timestamp'],
-                        'items': full_transaction['items_json'] or [],
+                        'items_count': full_transaction['items_count'] or 0,
+                        'display_summary': full_transaction['display_summary'],
                         'flagged': full_transaction['flagged'] or 0,
                         'similarity_score': similar_tx.get('similarity_score', 0),
                         'description': similar_tx.get('description', '')
@@ -380,9 +832,10 @@ def search_transactions():
         
         query = data['query']
         k = data.get('k', 5)  # Default to 5 results
+        ef_search = data.get('ef_search')  # Optional HNSW candidate list size
         
         # Search for similar transactions
-        similar_transactions = rag_engine.get_similar_transactions(query, k)
+        similar_transactions = rag_engine.get_similar_transactions(query, k, ef_search=ef_search)
         
         return jsonify({
             'success': True,
@@ -398,12 +851,136 @@ def search_transactions():
             'error': f'Search failed: {str(e)}'
         }), 500
 
+@app.route('/api/search/batch', methods=['POST'])
+def search_transactions_batch():
+    """API route to run several natural language searches in one request"""
+    try:
+        data = request.get_json()
+        queries = data.get('queries') if isinstance(data, dict) else None
+        if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+            return jsonify({
+                'success': False,
+                'error': 'A list of query strings is required'
+            }), 400
+        
+        if len(queries) > MAX_BATCH_QUERIES:
+            return jsonify({
+                'success': False,
+                'error': f'At most {MAX_BATCH_QUERIES} queries per batch'
+            }), 400
+        
+        k = data.get('k', 5)  # Default to 5 results per query
+        ef_search = data.get('ef_search')  # Optional HNSW candidate list size
+        
+        # Embed all queries together and search for each
+        batch_results = rag_engine.get_similar_transactions_batch(queries, k, ef_search=ef_search)
+        
+        return jsonify({
+            'success': True,
+            'results': [
+                {'query': query, 'results': results, 'count': len(results)}
+                for query, results in zip(queries, batch_results)
+            ]
+        })
+        
+    except Exception as e:
+        app.logger.error(f"Error running batch search: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Search failed: {str(e)}'
+        }), 500
+
+@app.route('/api/embed', methods=['POST'])
+def embed_search_query():
+    """API route to embed a search query for later /api/search/by_vector calls"""
+    try:
+        data = request.get_json()
+        query = data.get('query') if isinstance(data, dict) else None
+        if not isinstance(query, str) or not query.strip():
+            return jsonify({
+                'success': False,
+                'error': 'Query parameter is required'
+            }), 400
+        
+        embedding = rag_engine.embed_query(query)
+        if not embedding:
+            return jsonify({
+                'success': False,
+                'error': 'Embedding model is not available'
+            }), 503
+        
+        return jsonify({
+            'success': True,
+            'query': query,
+            'embedding': embedding,
+            'dimension': len(embedding)
+        })
+        
+    except Exception as e:
+        app.logger.error(f"Error embedding query: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Embedding failed: {str(e)}'
+        }), 500
+
+@app.route('/api/search/by_vector', methods=['POST'])
+def search_transactions_by_vector():
+    """API route to search for similar transactions with a precomputed query embedding"""
+    try:
+        data = request.get_json()
+        vector = data.get('vector') if isinstance(data, dict) else None
+        if not isinstance(vector, list) or not vector or not all(
+                isinstance(x, (int, float)) and not isinstance(x, bool) for x in vector):
+            return jsonify({
+                'success': False,
+                'error': 'A list of numbers is required for vector'
+            }), 400
+        
+        k = data.get('k', 5)  # Default to 5 results
+        ef_search = data.get('ef_search')  # Optional HNSW candidate list size
+        
+        try:
+            similar_transactions = rag_engine.get_similar_transactions_by_vector(vector, k, ef_search=ef_search)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'results': similar_transactions,
+            'count': len(similar_transactions)
+        })
+        
+    except Exception as e:
+        app.logger.error(f"Error searching transactions by vector: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Search failed: {str(e)}'
+        }), 500
+
+@app.route('/api/extraction/cache')
+def extraction_cache_stats():
+    """API route reporting extraction cache hits and misses since startup"""
+    return jsonify({
+        'success': True,
+        'cache': ai_extractor.get_extraction_cache_stats()
+    })
+
 @app.route('/api/context/<int:transaction_id>')
 def get_transaction_context(transaction_id):
     """API route to get context for a transaction (similar past transactions)"""
     try:
         k = request.args.get('k', 5, type=int)
         
+        # Skip the similarity search for IDs that don't exist
+        if not database.transaction_exists(transaction_id):
+            return jsonify({
+                'success': False,
+                'error': 'Transaction not found'
+            }), 404
+        
         # Get context for the transaction
         context = rag_engine.retrieve_context_for_transaction(transaction_id, k)
         
@@ -463,4 +1040,7 @@ def server_error(e):
     return render_template('500.html'), 500
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Run the LUMEN development server')
+    parser.add_argument('--port', type=int, default=5000, help='Port to listen on (default: 5000)')
+    args = parser.parse_args()
+    app.run(debug=True, port=args.port)
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+Shared pytest fixtures for the LUMEN test scripts
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+import httpx
+import pytest
+from test_utils import BASE_URL
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# pytest-xdist worker gwN gets its own app on APP_PORT + 1 + N, leaving the
+# development server's port free
+APP_PORT = 5000
+APP_STARTUP_SECONDS = 60
+
+@pytest.fixture(scope="session")
+def ai():
+    """ai_extractor with its clients and OCR model loaded once per test session"""
+    import ai_extractor
+    ai_extractor.warm_up()
+    return ai_extractor
+
+@contextmanager
+def running_app(port, workdir):
+    """Run app.py from workdir on port for the duration of the block, yielding its URL
+
+    Raises RuntimeError if the app exits or doesn't answer within
+    APP_STARTUP_SECONDS.
+    """
+    url = f"http://127.0.0.1:{port}"
+    
+    with open(workdir / "app.log", "wb") as log:
+        server = subprocess.Popen(
+            [sys.executable, APP_PATH, "--port", str(port)],
+            cwd=workdir, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+        try:
+            deadline = time.monotonic() + APP_STARTUP_SECONDS
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"app.py exited with code {server.returncode}; see {workdir / 'app.log'}")
+                try:
+                    if httpx.get(url).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"app.py didn't answer on {url} within {APP_STARTUP_SECONDS}s")
+                time.sleep(0.2)
+            
+            yield url
+        finally:
+            # Signal the whole group so the debug reloader's child exits too
+            try:
+                os.killpg(server.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            server.wait()
+
+@pytest.fixture(scope="session")
+def base_url(tmp_path_factory):
+    """URL of the Flask app this test process talks to
+
+    Without xdist this is the already running app at BASE_URL, and tests
+    that need it are skipped when nothing answers there. Under
+    pytest-xdist each worker starts its own app.py in a private directory,
+    so workers don't share the SQLite database, Chroma store or uploads.
+    """
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    if worker is None:
+        try:
+            httpx.get(BASE_URL)
+        except httpx.TransportError:
+            pytest.skip(f"Flask app not running on {BASE_URL}. Start it with: python app.py")
+        yield BASE_URL
+        return
+    
+    port = APP_PORT + 1 + int(worker[2:])
+    with running_app(port, tmp_path_factory.mktemp(f"app-{worker}")) as url:
+        yield url
+
+@pytest.fixture(scope="session")
+def scratch_base_url(request, tmp_path_factory):
+    """URL of an app whose database a test may fill with throwaway transactions
+
+    Under xdist the worker's own app already is one. Otherwise a private
+    app.py is started on APP_PORT + 1, which only xdist workers use; the
+    test is skipped if it can't be started.
+    """
+    if os.environ.get("PYTEST_XDIST_WORKER") is not None:
+        yield request.getfixturevalue("base_url")
+        return
+    
+    with ExitStack() as stack:
+        try:
+            url = stack.enter_context(running_app(APP_PORT + 1, tmp_path_factory.mktemp("app-scratch")))
+        except RuntimeError as e:
+            pytest.skip(f"No scratch app available: {e}")
+        yield url
@@ -1,21 +1,139 @@
+import atexit
+import os
 import sqlite3
-import json
+import threading
+import orjson
 from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 
 DATABASE_PATH = 'lumen.db'
 
+# Applied once when a connection is opened. WAL lets readers run alongside a
+# writer, and NORMAL sync is safe with WAL while skipping most fsyncs
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-64000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456'
+)
+
+# Columns that callers may select; anything else is rejected before it can
+# reach the SQL text
+TRANSACTION_COLUMNS = (
+    'id', 'user_id', 'vendor', 'date', 'amount', 'category', 'items_json',
+    'subtotal', 'tax', 'payment_method', 'raw_data_json', 'confidence_score',
+    'flagged', 'timestamp', 'display_summary', 'items_count'
+)
+
+# Everything a detail view shows; leaves out the raw_data_json blob
+SUMMARY_COLUMNS = (
+    'id', 'vendor', 'date', 'amount', 'category', 'items_json', 'subtotal',
+    'tax', 'payment_method', 'confidence_score', 'flagged', 'timestamp'
+)
+
+# Statements used on every request. sqlite3 keeps prepared statements in a
+# per-connection cache keyed on the SQL text; since each thread keeps its
+# connection across requests (see get_db_connection), these are compiled once
+# per thread rather than once per request. The cache is sized so IN (...)
+# lookups of varying length don't push them out
+STATEMENT_CACHE_SIZE = 256
+
+_SQL_INSERT = '''
+    INSERT INTO transactions (
+        user_id, vendor, date, amount, category, items_json,
+        subtotal, tax, payment_method, raw_data_json,
+        confidence_score, flagged, display_summary, items_count
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_SELECT_BY_ID = 'SELECT * FROM transactions WHERE id = ?'
+_SQL_SELECT_SUMMARY_BY_ID = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM transactions WHERE id = ?"
+_SQL_EXISTS = 'SELECT 1 FROM transactions WHERE id = ? LIMIT 1'
+_SQL_UPDATE = '''
+    UPDATE transactions SET
+        user_id = ?, vendor = ?, date = ?, amount = ?, category = ?,
+        items_json = ?, subtotal = ?, tax = ?, payment_method = ?,
+        raw_data_json = ?, confidence_score = ?, flagged = ?,
+        display_summary = ?, items_count = ?
+    WHERE id = ?
+'''
+_SQL_DELETE = 'DELETE FROM transactions WHERE id = ?'
+_SQL_INSERT_JOB = 'INSERT INTO jobs (filename) VALUES (?)'
+_SQL_UPDATE_JOB = '''
+    UPDATE jobs SET status = ?, transaction_id = ?, error = ?,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
+_SQL_SELECT_JOB = 'SELECT * FROM jobs WHERE id = ?'
+
+# Backfill expressions matching display_summary() and items_count()
+_SQL_DISPLAY_SUMMARY = (
+    "COALESCE(NULLIF(vendor, ''), 'Unknown Vendor') || ' · ' || "
+    "COALESCE(NULLIF(date, ''), 'Unknown Date') || ' · $' || printf('%.2f', COALESCE(amount, 0))"
+)
+_SQL_ITEMS_COUNT = (
+    "CASE WHEN json_valid(items_json) AND json_type(items_json) = 'array' "
+    "THEN json_array_length(items_json) ELSE 0 END"
+)
+
+# JSON columns are encoded and decoded with orjson
+_loads = orjson.loads
+
+def _dumps(obj: Any) -> str:
+    """Encode obj as a JSON string for a TEXT column."""
+    return orjson.dumps(obj).decode()
+
+# One connection per thread, reused by every query on that thread
+_local = threading.local()
+
+def _connect() -> sqlite3.Connection:
+    """Open a new connection and apply the connection PRAGMAs."""
+    conn = sqlite3.connect(DATABASE_PATH, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row  # Enable dict-like access to rows
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # Enable dict-like access to rows
+    """Context manager for the current thread's database connection."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = _connect()
     try:
         yield conn
-    finally:
+    except Exception:
+        # Don't leave a half-finished transaction on the shared connection
+        conn.rollback()
+        raise
+
+def close_db_connection():
+    """Close the current thread's database connection, if one is open.
+
+    Connections otherwise stay open for the life of their thread and are
+    closed when the thread exits and its thread-local storage is released.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.conn = None
         conn.close()
 
+# Connections a forked child inherited from its parent. SQLite handles must
+# not be used across a fork, and closing one counts, so they are kept
+# referenced and never touched again
+_inherited = []
+
+def _forget_connections():
+    """Give a forked child fresh thread-local connections."""
+    global _local
+    _inherited.append(_local)
+    _local = threading.local()
+
+# The main thread's connection outlives any request, so close it at exit
+atexit.register(close_db_connection)
+os.register_at_fork(after_in_child=_forget_connections)
+
 def init_db():
     """Initialize the database and create tables if they don't exist."""
     with get_db_connection() as conn:
@@ -37,13 +155,109 @@ def init_db():
                 raw_data_json TEXT,
                 confidence_score INTEGER,
                 flagged BOOLEAN DEFAULT 0,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                display_summary TEXT,
+                items_count INTEGER DEFAULT 0
+            )
+        ''')
+        
+        # Add the precomputed display columns to databases created before
+        # them, filling them in for the rows already there
+        existing_columns = {row['name'] for row in cursor.execute('PRAGMA table_info(transactions)')}
+        if 'display_summary' not in existing_columns:
+            cursor.execute('ALTER TABLE transactions ADD COLUMN display_summary TEXT')
+            cursor.execute(f'UPDATE transactions SET display_summary = {_SQL_DISPLAY_SUMMARY}')
+        if 'items_count' not in existing_columns:
+            cursor.execute('ALTER TABLE transactions ADD COLUMN items_count INTEGER DEFAULT 0')
+            cursor.execute(f'UPDATE transactions SET items_count = {_SQL_ITEMS_COUNT}')
+        
+        # Indexes for the newest-first listings, so they walk an index in
+        # order instead of scanning and sorting the whole table
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tx_user_ts ON transactions(user_id, timestamp DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tx_ts ON transactions(timestamp DESC)')
+        
+        # Create jobs table for uploads processed in the background
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT,
+                status TEXT DEFAULT 'pending',
+                transaction_id INTEGER,
+                error TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         ''')
         
         conn.commit()
         print("Database initialized successfully")
 
+def _row_to_transaction(row: sqlite3.Row) -> Dict[str, Any]:
+    """Convert a transactions row to a dict, parsing JSON fields back to Python objects."""
+    transaction = dict(row)
+    
+    for field in ('items_json', 'raw_data_json'):
+        if transaction.get(field):
+            try:
+                transaction[field] = _loads(transaction[field])
+            except orjson.JSONDecodeError:
+                pass
+    
+    return transaction
+
+def display_summary(data: Dict[str, Any]) -> str:
+    """Build the one-line summary stored with a transaction, e.g. 'Walmart · 2024-01-15 · $4.29'."""
+    return f"{data.get('vendor') or 'Unknown Vendor'} · {data.get('date') or 'Unknown Date'} · ${float(data.get('amount') or 0):.2f}"
+
+def items_count(items_json: Any) -> int:
+    """Count the items in a list or a JSON-encoded list, 0 for anything else."""
+    if isinstance(items_json, str):
+        try:
+            items_json = _loads(items_json)
+        except orjson.JSONDecodeError:
+            return 0
+    return len(items_json) if isinstance(items_json, list) else 0
+
+def _select_columns(columns: Optional[Sequence[str]]) -> str:
+    """Build the SELECT column list for the given transaction columns, or * for all."""
+    if not columns:
+        return '*'
+    
+    unknown = [column for column in columns if column not in TRANSACTION_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown transaction columns: {', '.join(unknown)}")
+    
+    return ', '.join(columns)
+
+def _insert_params(data: Dict[str, Any]) -> tuple:
+    """Build the _SQL_INSERT parameters for a transaction dict."""
+    # Convert items and raw_data to JSON strings if they're not already
+    items_json = data.get('items_json')
+    item_total = items_count(items_json)
+    if isinstance(items_json, (dict, list)):
+        items_json = _dumps(items_json)
+        
+    raw_data_json = data.get('raw_data_json')
+    if isinstance(raw_data_json, (dict, list)):
+        raw_data_json = _dumps(raw_data_json)
+    
+    return (
+        data.get('user_id', 1),
+        data.get('vendor'),
+        data.get('date'),
+        data.get('amount'),
+        data.get('category'),
+        items_json,
+        data.get('subtotal'),
+        data.get('tax'),
+        data.get('payment_method'),
+        raw_data_json,
+        data.get('confidence_score'),
+        data.get('flagged', 0),
+        display_summary(data),
+        item_total
+    )
+
 def save_transaction(data: Dict[str, Any]) -> int:
     """
     Insert a new transaction into the database.
@@ -57,41 +271,40 @@ def save_transaction(data: Dict[str, Any]) -> int:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # Convert items and raw_data to JSON strings if they're not already
-        items_json = data.get('items_json')
-        if isinstance(items_json, (dict, list)):
-            items_json = json.dumps(items_json)
-            
-        raw_data_json = data.get('raw_data_json')
-        if isinstance(raw_data_json, (dict, list)):
-            raw_data_json = json.dumps(raw_data_json)
-        
-        cursor.execute('''
-            INSERT INTO transactions (
-                user_id, vendor, date, amount, category, items_json,
-                subtotal, tax, payment_method, raw_data_json,
-                confidence_score, flagged
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data.get('user_id', 1),
-            data.get('vendor'),
-            data.get('date'),
-            data.get('amount'),
-            data.get('category'),
-            items_json,
-            data.get('subtotal'),
-            data.get('tax'),
-            data.get('payment_method'),
-            raw_data_json,
-            data.get('confidence_score'),
-            data.get('flagged', 0)
-        ))
+        cursor.execute(_SQL_INSERT, _insert_params(data))
         
         transaction_id = cursor.lastrowid
         conn.commit()
         
         return transaction_id
 
+def save_transactions(transactions: List[Dict[str, Any]]) -> List[int]:
+    """
+    Insert several transactions with one executemany and a single commit.
+    
+    Args:
+        transactions: List of dictionaries containing transaction data
+        
+    Returns:
+        List of the inserted transaction IDs, in the same order
+    """
+    if not transactions:
+        return []
+    
+    rows = [_insert_params(data) for data in transactions]
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.executemany(_SQL_INSERT, rows)
+        
+        # The inserts share one write transaction, so nothing else can take
+        # IDs in between and AUTOINCREMENT hands them out consecutively
+        last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+        conn.commit()
+        
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
 def get_transaction(transaction_id: int) -> Optional[Dict[str, Any]]:
     """
     Retrieve a single transaction by ID.
@@ -105,69 +318,126 @@ def get_transaction(transaction_id: int) -> Optional[Dict[str, Any]]:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM transactions WHERE id = ?', (transaction_id,))
+        cursor.execute(_SQL_SELECT_BY_ID, (transaction_id,))
         row = cursor.fetchone()
         
         if row:
-            transaction = dict(row)
-            
-            # Parse JSON fields back to Python objects
-            if transaction['items_json']:
-                try:
-                    transaction['items_json'] = json.loads(transaction['items_json'])
-                except json.JSONDecodeError:
-                    pass
-                    
-            if transaction['raw_data_json']:
-                try:
-                    transaction['raw_data_json'] = json.loads(transaction['raw_data_json'])
-                except json.JSONDecodeError:
-                    pass
-                    
-            return transaction
+            return _row_to_transaction(row)
         
         return None
 
-def get_all_transactions() -> List[Dict[str, Any]]:
+def get_transaction_summary(transaction_id: int) -> Optional[Dict[str, Any]]:
     """
-    Retrieve all transactions from the database.
+    Retrieve a single transaction by ID without its raw extraction data.
     
+    Args:
+        transaction_id: The ID of the transaction to retrieve
+        
+    Returns:
+        Dict containing the SUMMARY_COLUMNS of the transaction or None if not found
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(_SQL_SELECT_SUMMARY_BY_ID, (transaction_id,))
+        row = cursor.fetchone()
+        
+        if row:
+            return _row_to_transaction(row)
+        
+        return None
+
+def transaction_exists(transaction_id: int) -> bool:
+    """
+    Check whether a transaction exists without reading any of its columns.
+    
+    Args:
+        transaction_id: The ID of the transaction to look for
+        
+    Returns:
+        bool: True if the transaction exists, False otherwise
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(_SQL_EXISTS, (transaction_id,))
+        return cursor.fetchone() is not None
+
+def get_transactions_by_ids(transaction_ids: List[int],
+                            columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Retrieve several transactions in a single query.
+    
+    Args:
+        transaction_ids: IDs of the transactions to retrieve
+        columns: Columns to select, or None for all of them; id is always
+            included since results are matched up by it
+        
+    Returns:
+        List of dictionaries containing transaction data, in the order of
+        transaction_ids; IDs that don't exist are skipped
+    """
+    if not transaction_ids:
+        return []
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        placeholders = ','.join('?' * len(transaction_ids))
+        if columns and 'id' not in columns:
+            columns = ('id', *columns)
+        cursor.execute(
+            f'SELECT {_select_columns(columns)} FROM transactions WHERE id IN ({placeholders})',
+            list(transaction_ids)
+        )
+        by_id = {row['id']: _row_to_transaction(row) for row in cursor.fetchall()}
+        
+        return [by_id[transaction_id] for transaction_id in transaction_ids if transaction_id in by_id]
+
+def get_all_transactions(columns: Optional[Sequence[str]] = None, limit: Optional[int] = None,
+                         before: Optional[Tuple[str, int]] = None) -> List[Dict[str, Any]]:
+    """
+    Retrieve transactions from the database, newest first.
+    
+    Pages are keyed on (timestamp, id) rather than an offset, so each page
+    walks the timestamp index from where the last one stopped.
+    
+    Args:
+        columns: Columns to select, or None for all of them. Leaving out
+            items_json and raw_data_json skips reading and decoding the
+            JSON blobs, which list views don't need
+        limit: Maximum number of transactions to return, or None for all
+        before: (timestamp, id) of the last transaction on the previous
+            page; only older transactions are returned
+        
     Returns:
         List of dictionaries containing transaction data
     """
+    query = f'SELECT {_select_columns(columns)} FROM transactions'
+    params: List[Any] = []
+    if before:
+        query += ' WHERE (timestamp, id) < (?, ?)'
+        params.extend(before)
+    query += ' ORDER BY timestamp DESC, id DESC'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM transactions ORDER BY timestamp DESC')
+        cursor.execute(query, params)
         rows = cursor.fetchall()
         
-        transactions = []
-        for row in rows:
-            transaction = dict(row)
-            
-            # Parse JSON fields back to Python objects
-            if transaction['items_json']:
-                try:
-                    transaction['items_json'] = json.loads(transaction['items_json'])
-                except json.JSONDecodeError:
-                    pass
-                    
-            if transaction['raw_data_json']:
-                try:
-                    transaction['raw_data_json'] = json.loads(transaction['raw_data_json'])
-                except json.JSONDecodeError:
-                    pass
-                    
-            transactions.append(transaction)
-        
-        return transactions
-
-def get_transactions_by_user(user_id: int) -> List[Dict[str, Any]]:
+        return [_row_to_transaction(row) for row in rows]
+
+def get_transactions_by_user(user_id: int, columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
     """
     Retrieve all transactions for a specific user.
     
     Args:
         user_id: The ID of the user
+        columns: Columns to select, or None for all of them
         
     Returns:
         List of dictionaries containing transaction data
@@ -175,29 +445,13 @@ def get_transactions_by_user(user_id: int) -> List[Dict[str, Any]]:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM transactions WHERE user_id = ? ORDER BY timestamp DESC', (user_id,))
+        cursor.execute(
+            f'SELECT {_select_columns(columns)} FROM transactions WHERE user_id = ? ORDER BY timestamp DESC',
+            (user_id,)
+        )
         rows = cursor.fetchall()
         
-        transactions = []
-        for row in rows:
-            transaction = dict(row)
-            
-            # Parse JSON fields back to Python objects
-            if transaction['items_json']:
-                try:
-                    transaction['items_json'] = json.loads(transaction['items_json'])
-                except json.JSONDecodeError:
-                    pass
-                    
-            if transaction['raw_data_json']:
-                try:
-                    transaction['raw_data_json'] = json.loads(transaction['raw_data_json'])
-                except json.JSONDecodeError:
-                    pass
-                    
-            transactions.append(transaction)
-        
-        return transactions
+        return [_row_to_transaction(row) for row in rows]
 
 def update_transaction(transaction_id: int, data: Dict[str, Any]) -> bool:
     """
@@ -215,20 +469,15 @@ def update_transaction(transaction_id: int, data: Dict[str, Any]) -> bool:
         
         # Convert items and raw_data to JSON strings if they're not already
         items_json = data.get('items_json')
+        item_total = items_count(items_json)
         if isinstance(items_json, (dict, list)):
-            items_json = json.dumps(items_json)
+            items_json = _dumps(items_json)
             
         raw_data_json = data.get('raw_data_json')
         if isinstance(raw_data_json, (dict, list)):
-            raw_data_json = json.dumps(raw_data_json)
+            raw_data_json = _dumps(raw_data_json)
         
-        cursor.execute('''
-            UPDATE transactions SET
-                user_id = ?, vendor = ?, date = ?, amount = ?, category = ?,
-                items_json = ?, subtotal = ?, tax = ?, payment_method = ?,
-                raw_data_json = ?, confidence_score = ?, flagged = ?
-            WHERE id = ?
-        ''', (
+        cursor.execute(_SQL_UPDATE, (
             data.get('user_id', 1),
             data.get('vendor'),
             data.get('date'),
@@ -241,6 +490,8 @@ def update_transaction(transaction_id: int, data: Dict[str, Any]) -> bool:
             raw_data_json,
             data.get('confidence_score'),
             data.get('flagged', 0),
+            display_summary(data),
+            item_total,
             transaction_id
         ))
         
@@ -262,12 +513,75 @@ def delete_transaction(transaction_id: int) -> bool:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        cursor.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
+        cursor.execute(_SQL_DELETE, (transaction_id,))
+        success = cursor.rowcount > 0
+        conn.commit()
+        
+        return success
+
+def create_job(filename: str) -> int:
+    """
+    Insert a new pending background job.
+    
+    Args:
+        filename: Original name of the uploaded file
+        
+    Returns:
+        int: The ID of the inserted job
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(_SQL_INSERT_JOB, (filename,))
+        job_id = cursor.lastrowid
+        conn.commit()
+        
+        return job_id
+
+def update_job(job_id: int, status: str, transaction_id: Optional[int] = None,
+               error: Optional[str] = None) -> bool:
+    """
+    Update the status of a background job.
+    
+    Args:
+        job_id: The ID of the job to update
+        status: New status ('pending', 'processing', 'done' or 'failed')
+        transaction_id: ID of the saved transaction, once there is one
+        error: Error message if the job failed
+        
+    Returns:
+        bool: True if update was successful, False otherwise
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(_SQL_UPDATE_JOB, (status, transaction_id, error, job_id))
         success = cursor.rowcount > 0
         conn.commit()
         
         return success
 
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Retrieve a background job by ID.
+    
+    Args:
+        job_id: The ID of the job to retrieve
+        
+    Returns:
+        Dict containing job data or None if not found
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(_SQL_SELECT_JOB, (job_id,))
+        row = cursor.fetchone()
+        
+        if row:
+            return dict(row)
+        
+        return None
+
 def initialize_database():
     """Initialize the database when the app starts."""
     try:
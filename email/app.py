@@ -3,22 +3,84 @@ os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 
 import os
 import base64
-from flask import Flask, redirect, url_for, session, render_template, send_file
+import hashlib
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+from weakref import WeakValueDictionary
+import httplib2
+import orjson
+from cachetools import LRUCache
+from google_auth_httplib2 import AuthorizedHttp
+from flask import Flask, Response, g, redirect, url_for, session, render_template
 from flask import request
+from flask.json.provider import DefaultJSONProvider
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 from dotenv import load_dotenv
-from io import BytesIO
 
 load_dotenv()
 
+# JSON (including the signed session cookie holding the credentials) goes
+# through orjson; types it can't handle fall back to Flask's default hook
+class OrjsonProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        # The session serializer passes object_hook to untag tuples and dates
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = os.getenv("FLASK_SECRET_KEY")
 
 CLIENT_SECRET_FILE = os.getenv("GOOGLE_CLIENT_SECRET_FILE")
 SCOPES = [os.getenv("GOOGLE_SCOPES")]
 
+# Base64 characters decoded per streamed block (a multiple of 4, so 48 KB out)
+DECODE_CHUNK_CHARS = 64 * 1024
+
+# Built Gmail clients per access token, so each request reuses the parsed
+# discovery document and the open HTTPS connection. httplib2 isn't
+# thread-safe, so every client comes with a lock held while it's in use.
+_gmail_clients = LRUCache(maxsize=64)
+_gmail_clients_lock = threading.Lock()
+
+# Credentials per session access token; entries live as long as a cached
+# Gmail client (or a request) still holds them
+_credentials = WeakValueDictionary()
+
+@app.before_request
+def load_credentials():
+    info = session.get("credentials")
+    if info is None:
+        g.creds = None
+        return
+
+    g.creds_key = hashlib.sha256(info["token"].encode()).hexdigest()
+    creds = _credentials.get(g.creds_key)
+    if creds is None:
+        creds = Credentials(**info)
+        _credentials[g.creds_key] = creds
+    g.creds = creds
+
+@contextmanager
+def gmail_client():
+    key = g.creds_key
+    with _gmail_clients_lock:
+        entry = _gmail_clients.get(key)
+        if entry is None:
+            http = AuthorizedHttp(g.creds, http=httplib2.Http())
+            entry = (build("gmail", "v1", http=http, static_discovery=True), threading.Lock())
+            _gmail_clients[key] = entry
+    gmail, lock = entry
+    with lock:
+        yield gmail
+
 # ---------------------- HOME ----------------------
 @app.route("/")
 def index():
@@ -71,25 +133,45 @@ def oauth2callback():
 # ---------------------- Dashboard ----------------------
 @app.route("/dashboard")
 def dashboard():
-    if "credentials" not in session:
+    if g.creds is None:
         return redirect(url_for("index"))
 
-    creds = Credentials(**session["credentials"])
-    gmail = build("gmail", "v1", credentials=creds)
-
     query = 'subject:(invoice OR statement OR "bank statement" OR receipt) has:attachment filename:pdf'
 
-    results = gmail.users().messages().list(userId="me", q=query, maxResults=25).execute()
-    messages = results.get("messages", [])
+    with gmail_client() as gmail:
+        results = gmail.users().messages().list(userId="me", q=query, maxResults=25).execute()
+        messages = results.get("messages", [])
+
+        # Fetch all messages in one batched HTTP request, keeping only the fields the page uses
+        fetched = {}
+
+        def collect(request_id, response, exception):
+            if exception is None:
+                fetched[request_id] = response
+
+        batch = gmail.new_batch_http_request(callback=collect)
+        for msg in messages:
+            batch.add(
+                gmail.users().messages().get(
+                    userId="me",
+                    id=msg["id"],
+                    format="full",
+                    fields="snippet,payload/parts(filename,body/attachmentId)"
+                ),
+                request_id=msg["id"]
+            )
+        batch.execute()
 
     emails = []
 
     for msg in messages:
-        full_msg = gmail.users().messages().get(userId="me", id=msg["id"], format="full").execute()
+        full_msg = fetched.get(msg["id"])
+        if full_msg is None:
+            continue
         snippet = full_msg.get("snippet", "")
 
         attachments = []
-        parts = full_msg["payload"].get("parts", [])
+        parts = full_msg.get("payload", {}).get("parts", [])
         for part in parts:
             if part.get("filename") and part.get("body", {}).get("attachmentId"):
                 attachments.append({
@@ -108,25 +190,34 @@ def dashboard():
 # ---------------------- Download Attachment ----------------------
 @app.route("/download/<message_id>/<attachment_id>/<filename>")
 def download(message_id, attachment_id, filename):
+    if g.creds is None:
+        return redirect(url_for("index"))
 
-    creds = Credentials(**session["credentials"])
-    gmail = build("gmail", "v1", credentials=creds)
-
-    attachment = gmail.users().messages().attachments().get(
-        userId="me",
-        messageId=message_id,
-        id=attachment_id
-    ).execute()
+    with gmail_client() as gmail:
+        attachment = gmail.users().messages().attachments().get(
+            userId="me",
+            messageId=message_id,
+            id=attachment_id
+        ).execute()
 
     data = attachment["data"]
-    file_data = base64.urlsafe_b64decode(data)
 
-    return send_file(
-        BytesIO(file_data),
-        as_attachment=True,
-        download_name=filename,
-        mimetype="application/pdf"
-    )
+    # Decode a block at a time as the response is sent instead of holding
+    # the whole decoded file next to its base64 text
+    def decode_chunks():
+        for start in range(0, len(data), DECODE_CHUNK_CHARS):
+            chunk = data[start:start + DECODE_CHUNK_CHARS]
+            yield base64.urlsafe_b64decode(chunk + "=" * (-len(chunk) % 4))
+
+    response = Response(decode_chunks(), mimetype="application/pdf")
+    try:
+        filename.encode("ascii")
+        disposition = {"filename": filename}
+    except UnicodeEncodeError:
+        disposition = {"filename*": "UTF-8''" + quote(filename)}
+    response.headers.set("Content-Disposition", "attachment", **disposition)
+    response.content_length = len(data.rstrip("=")) * 3 // 4
+    return response
 
 # ---------------------- LOGOUT ----------------------
 @app.route("/logout")
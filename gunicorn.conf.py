@@ -0,0 +1,29 @@
+# Gunicorn settings for serving LUMEN: gunicorn -c gunicorn.conf.py app:app
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# One process: the ChromaDB persistent client, the embedding model, the
+# extraction pool and the background job/vector writers all live in-process
+# and the Chroma index must not be written from several processes. Requests
+# are mostly waiting on the NVIDIA API, so they are spread over threads.
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 2 * multiprocessing.cpu_count() + 1))
+
+# Import the app once in the master so workers fork with Flask, the templates
+# and the database schema already set up. The embedding model (ONNX Runtime
+# thread pools) and the Chroma client (SQLite handles) aren't fork-safe, so
+# app.py skips loading them and each worker warms them up after the fork.
+preload_app = True
+os.environ.setdefault('LUMEN_DEFER_RAG_INIT', '1')
+
+def post_fork(server, worker):
+    import rag_engine
+    rag_engine.warm_up_rag_engine()
+
+# Extraction can take up to EXTRACTION_TIMEOUT (120 s) before /upload answers
+timeout = 130
+graceful_timeout = 30
+keepalive = 5
@@ -1,8 +1,17 @@
 import os
-import json
+import atexit
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import queue
+import statistics
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 import chromadb
+import numpy as np
+from cachetools import LRUCache, TTLCache
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 import database
@@ -11,24 +20,253 @@ import database
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Query caches: embeddings are kept by normalized query text, full search
+# results for a short while keyed on the corpus version they were run against
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+SEARCH_CACHE_SIZE = 512
+SEARCH_CACHE_TTL = 60  # seconds
+
+# Upper bound on the candidate pool a caller can ask for through ef_search
+MAX_EF_SEARCH = 512
+
+# HNSW build/search parameters for new collections and the ef_search sweep
+HNSW_M = 32
+HNSW_CONSTRUCTION_EF = 200
+HNSW_SEARCH_EF = 64
+EF_SEARCH_CANDIDATES = (16, 32, 64, 128)
+EF_TUNING_SAMPLE_SIZE = 50
+
+# Embeddings run on ONNX Runtime with the int8 model published alongside
+# all-MiniLM-L6-v2; set EMBEDDING_BACKEND=torch to use the FP32 PyTorch model,
+# or model2vec for a static (no transformer layers) distilled model
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'onnx')
+SENTENCE_TRANSFORMER_MODEL = "all-MiniLM-L6-v2"
+MODEL2VEC_MODEL = "minishlab/potion-base-8M"
+ONNX_MODEL_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+EMBEDDING_BATCH_SIZE = 64
+
+# Embeddings are stored unit-length, so inner product ranks exactly like
+# cosine without normalizing on every distance computation
+HNSW_SPACE = "ip"
+MIGRATION_BATCH_SIZE = 1000
+
+# Collections up to this size are searched by brute force over an in-memory
+# int8 copy of the vectors; the best k * RERANK_FACTOR are rescored in FP32
+BRUTE_FORCE_MAX_VECTORS = 50_000
+RERANK_FACTOR = 4
+SCAN_CHUNK_ROWS = 8192
+
+# Transaction texts are rebuilt from the same fields on every ingest/lookup
+TRANSACTION_TEXT_CACHE_SIZE = 2048
+
+@lru_cache(maxsize=TRANSACTION_TEXT_CACHE_SIZE)
+def _transaction_text(vendor: str, category: str, items_key: Tuple[Tuple[Any, Any], ...],
+                      item_total: int, date: str, amount: float) -> str:
+    """
+    Build the descriptive text for a transaction; cached on its fields.
+    
+    Args:
+        vendor: Store/vendor name
+        category: Transaction category
+        items_key: (name, price) of up to the first 10 named items
+        item_total: Number of items on the transaction
+        date: Transaction date
+        amount: Total amount
+        
+    Returns:
+        Descriptive text for embedding
+    """
+    # Format items list
+    items_text = ""
+    if items_key:
+        items_text = f"Items: {', '.join(f'{name} (${price:.2f})' for name, price in items_key)}"
+        if item_total > 10:
+            items_text += f" and {item_total - 10} more items"
+    
+    # Create descriptive text
+    base_text = f"Transaction at {vendor or 'unknown store'} on {date or 'unknown date'} for {category or 'general'} spending ${amount:.2f}"
+    
+    if items_text:
+        return f"{base_text}. {items_text}"
+    return base_text
+
+def _normalize_query(query: str) -> str:
+    """The embedding model is uncased, so case and spacing don't matter"""
+    return ' '.join(query.lower().split())
+
+class Model2VecEncoder:
+    """SentenceTransformer-style encode() over a Model2Vec static model"""
+    
+    def __init__(self, model_name: str):
+        from model2vec import StaticModel
+        self.model = StaticModel.from_pretrained(model_name)
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        """Length of the vectors encode() returns"""
+        return self.model.dim
+    
+    def encode(self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False,
+               show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Embed texts as a float32 array.
+        
+        Args:
+            texts: Texts to embed
+            batch_size: Texts per batch
+            convert_to_numpy: Accepted for compatibility; output is always numpy
+            normalize_embeddings: Scale each row to unit length
+            show_progress_bar: Show a progress bar while encoding
+            
+        Returns:
+            (len(texts), dim) embedding array
+        """
+        embeddings = np.asarray(
+            self.model.encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar),
+            dtype=np.float32
+        )
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.where(norms == 0, 1, norms)
+        return embeddings
+
+class QuantizedVectors:
+    """In-memory int8 copy of the collection's vectors for brute-force search"""
+    
+    def __init__(self):
+        self.ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._codes = None   # (capacity, dim) int8
+        self._scales = None  # (capacity,) float32
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def add(self, ids: Sequence[str], embeddings: np.ndarray):
+        """
+        Quantize and store vectors, replacing any rows with the same IDs.
+        
+        Each row is scaled by its own max |value| so it uses the full int8
+        range, and the scale is kept to undo it at search time.
+        
+        Args:
+            ids: Vector IDs
+            embeddings: (n, dim) float array
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        scales = np.abs(embeddings).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.rint(embeddings / scales[:, None]).astype(np.int8)
+        
+        with self._lock:
+            if self._codes is None:
+                self._codes = np.empty((max(len(ids), 64), embeddings.shape[1]), dtype=np.int8)
+                self._scales = np.empty(len(self._codes), dtype=np.float32)
+            
+            for vector_id, code, scale in zip(ids, codes, scales):
+                row = self._rows.get(vector_id)
+                if row is None:
+                    row = len(self.ids)
+                    if row == len(self._codes):
+                        # Grow by doubling; searches keep using the old arrays
+                        self._codes = np.concatenate([self._codes, np.empty_like(self._codes)])
+                        self._scales = np.concatenate([self._scales, np.empty_like(self._scales)])
+                    self._rows[vector_id] = row
+                    self.ids.append(vector_id)
+                self._codes[row] = code
+                self._scales[row] = scale
+    
+    def search(self, query: np.ndarray, n: int, exclude: Optional[str] = None) -> List[str]:
+        """
+        Approximate top-n IDs by inner product with the query.
+        
+        Args:
+            query: Unit-length query vector
+            n: Number of IDs to return
+            exclude: Vector ID to leave out
+            
+        Returns:
+            IDs of the best matches, best first
+        """
+        with self._lock:
+            count = len(self.ids)
+            codes, scales, ids = self._codes, self._scales, self.ids
+        if not count:
+            return []
+        
+        # Dequantize a chunk at a time so the FP32 copy stays cache-sized
+        query = np.asarray(query, dtype=np.float32)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SCAN_CHUNK_ROWS):
+            end = min(start + SCAN_CHUNK_ROWS, count)
+            scores[start:end] = (codes[start:end].astype(np.float32) @ query) * scales[start:end]
+        
+        if exclude is not None and exclude in self._rows:
+            scores[self._rows[exclude]] = -np.inf
+        
+        n = min(n, count)
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top])]
+        return [ids[i] for i in top if scores[i] != -np.inf]
+
 class RAGEngine:
     """RAG Engine for semantic search of financial transactions using ChromaDB"""
     
-    def __init__(self, db_path: str = "chroma_db"):
+    def __init__(self, db_path: str = "chroma_db", hnsw_m: int = HNSW_M,
+                 hnsw_construction_ef: int = HNSW_CONSTRUCTION_EF,
+                 hnsw_search_ef: int = HNSW_SEARCH_EF,
+                 embedding_backend: str = EMBEDDING_BACKEND):
         """
         Initialize the RAG engine with ChromaDB and sentence transformer model.
         
         Args:
             db_path: Path to store ChromaDB data
+            hnsw_m: Graph links per node when the collection is created
+            hnsw_construction_ef: Candidate list size while building the graph
+            hnsw_search_ef: Candidate list size the index searches with
+            embedding_backend: "onnx", "torch" or "model2vec"
         """
         self.db_path = db_path
         self.collection_name = "financial_transactions"
-        self.model_name = "all-MiniLM-L6-v2"
+        self.embedding_backend = embedding_backend
+        if embedding_backend == 'model2vec':
+            self.model_name = MODEL2VEC_MODEL
+        else:
+            self.model_name = SENTENCE_TRANSFORMER_MODEL
+        
+        # HNSW parameters are fixed once the collection exists; the model is
+        # recorded so vectors from a different one get re-encoded
+        self.collection_metadata = {
+            "hnsw:space": HNSW_SPACE,
+            "hnsw:M": hnsw_m,
+            "hnsw:construction_ef": hnsw_construction_ef,
+            "hnsw:search_ef": hnsw_search_ef,
+            "embedding_model": self.model_name
+        }
+        
+        # Default ef_search for queries that don't pass one; see tune_ef_search
+        self.ef_search = None
         
         # Initialize components
         self.client = None
         self.collection = None
         self.embedding_model = None
+        self.embedding_dim = None
+        
+        # Bumped on every insert so cached search results go stale
+        self.corpus_version = 0
+        self._query_embeddings = LRUCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+        self._query_embeddings_lock = threading.Lock()
+        self._search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+        self._search_cache_lock = threading.Lock()
+        
+        # int8 copy of the vectors, or None once the collection is too large
+        self.quantized = None
+        
+        # Vectors in the collection, refreshed on every write so searches of an
+        # empty collection can skip the embedding model
+        self.vector_count = 0
         
         self._initialize_components()
     
@@ -44,15 +282,32 @@ class RAGEngine:
                 )
             )
             
-            # Create or get collection with cosine similarity
-            self.collection = self.client.get_or_create_collection(
-                name=self.collection_name,
-                metadata={"hnsw:space": "cosine"}
-            )
+            # Initialize embedding model
+            logger.info(f"Loading embedding model: {self.model_name} ({self.embedding_backend})")
+            self.embedding_model = self._load_embedding_model()
+            self.embedding_dim = self.embedding_model.get_sentence_embedding_dimension()
             
-            # Initialize sentence transformer model
-            logger.info(f"Loading embedding model: {self.model_name}")
-            self.embedding_model = SentenceTransformer(self.model_name)
+            # Get the collection, rebuilding it if it predates the ip space
+            # or was embedded with another model
+            try:
+                self.collection = self.client.get_collection(name=self.collection_name)
+            except Exception:
+                self.collection = None
+            
+            if self.collection is None:
+                self.collection = self.client.create_collection(
+                    name=self.collection_name,
+                    metadata=self.collection_metadata
+                )
+            else:
+                existing_metadata = self.collection.metadata or {}
+                if existing_metadata.get("embedding_model", SENTENCE_TRANSFORMER_MODEL) != self.model_name:
+                    self._migrate_collection(reembed=True)
+                elif existing_metadata.get("hnsw:space") != HNSW_SPACE:
+                    self._migrate_collection()
+            
+            self.vector_count = self.collection.count()
+            self._load_quantized_vectors()
             
             logger.info("RAG Engine initialized successfully")
             
@@ -60,6 +315,85 @@ class RAGEngine:
             logger.error(f"Failed to initialize RAG Engine: {e}")
             raise
     
+    def _migrate_collection(self, reembed: bool = False):
+        """
+        Recreate the collection with the current metadata.
+        
+        Args:
+            reembed: Encode the stored documents again with the current model
+                instead of normalizing the stored vectors
+        """
+        include = ["documents", "metadatas"] if reembed else ["embeddings", "documents", "metadatas"]
+        existing = self.collection.get(include=include)
+        count = len(existing['ids'])
+        logger.info(f"Migrating {count} vectors in {self.collection_name} to "
+                    f"{self.model_name} in {HNSW_SPACE} space")
+        
+        self.client.delete_collection(name=self.collection_name)
+        self.collection = self.client.create_collection(
+            name=self.collection_name,
+            metadata=self.collection_metadata
+        )
+        
+        if not count:
+            return
+        
+        if reembed:
+            embeddings = self._encode_documents(existing['documents'])
+        else:
+            embeddings = np.asarray(existing['embeddings'], dtype=np.float32)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.where(norms == 0, 1, norms)
+        
+        for start in range(0, count, MIGRATION_BATCH_SIZE):
+            end = start + MIGRATION_BATCH_SIZE
+            self.collection.add(
+                embeddings=embeddings[start:end].tolist(),
+                documents=existing['documents'][start:end],
+                metadatas=existing['metadatas'][start:end],
+                ids=existing['ids'][start:end]
+            )
+    
+    def _load_quantized_vectors(self):
+        """Build the int8 copy of the collection if it's small enough to scan"""
+        count = self.vector_count
+        if count > BRUTE_FORCE_MAX_VECTORS:
+            self.quantized = None
+            return
+        
+        self.quantized = QuantizedVectors()
+        for offset in range(0, count, MIGRATION_BATCH_SIZE):
+            page = self.collection.get(
+                include=["embeddings"],
+                limit=MIGRATION_BATCH_SIZE,
+                offset=offset
+            )
+            if page['ids']:
+                self.quantized.add(page['ids'], page['embeddings'])
+    
+    def _load_embedding_model(self) -> Any:
+        """
+        Load the embedding model for the configured backend.
+        
+        Returns:
+            The embedding model; the ONNX backend falls back to PyTorch if
+            the ONNX model can't be loaded
+        """
+        if self.embedding_backend == 'model2vec':
+            return Model2VecEncoder(self.model_name)
+        
+        if self.embedding_backend == 'onnx':
+            try:
+                return SentenceTransformer(
+                    self.model_name,
+                    backend="onnx",
+                    model_kwargs={"file_name": ONNX_MODEL_FILE}
+                )
+            except Exception as e:
+                logger.warning(f"ONNX embedding model unavailable, using PyTorch: {e}")
+        
+        return SentenceTransformer(self.model_name)
+    
     def _create_transaction_text(self, vendor: str, category: str, items_json: List[Dict], 
                                 date: str, amount: float) -> str:
         """
@@ -76,35 +410,58 @@ class RAGEngine:
             Descriptive text for embedding
         """
         try:
-            # Format items list
-            items_text = ""
+            # Only the first 10 named items make it into the text
+            items_key = ()
+            item_total = 0
             if items_json and isinstance(items_json, list):
-                item_names = []
-                for item in items_json:
-                    if isinstance(item, dict) and 'name' in item:
-                        name = item['name']
-                        price = item.get('price', 0)
-                        item_names.append(f"{name} (${price:.2f})")
-                
-                if item_names:
-                    items_text = f"Items: {', '.join(item_names[:10])}"  # Limit to 10 items
-                    if len(items_json) > 10:
-                        items_text += f" and {len(items_json) - 10} more items"
+                items_key = tuple(islice(
+                    ((item['name'], item.get('price', 0)) for item in items_json
+                     if isinstance(item, dict) and 'name' in item),
+                    10
+                ))
+                item_total = len(items_json)
             
-            # Create descriptive text
-            base_text = f"Transaction at {vendor or 'unknown store'} on {date or 'unknown date'} for {category or 'general'} spending ${amount:.2f}"
-            
-            if items_text:
-                full_text = f"{base_text}. {items_text}"
-            else:
-                full_text = base_text
-            
-            return full_text
+            fields = (vendor, category, items_key, item_total, date, amount)
+            try:
+                hash(fields)
+            except TypeError:
+                # Unhashable field values can't be cached
+                return _transaction_text.__wrapped__(*fields)
+            return _transaction_text(*fields)
             
         except Exception as e:
             logger.error(f"Error creating transaction text: {e}")
             return f"Transaction at {vendor or 'unknown'} for ${amount:.2f}"
     
+    def _prepare_transaction(self, transaction_id: int, vendor: str, category: str,
+                             items_json: List[Dict], date: str, amount: float) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Build the ID, document text and metadata stored for a transaction.
+        
+        Args:
+            transaction_id: Unique transaction ID
+            vendor: Store/vendor name
+            category: Transaction category
+            items_json: List of items purchased
+            date: Transaction date
+            amount: Total amount
+            
+        Returns:
+            Tuple of (vector ID, descriptive text, metadata)
+        """
+        transaction_text = self._create_transaction_text(vendor, category, items_json, date, amount)
+        
+        metadata = {
+            "transaction_id": transaction_id,
+            "vendor": vendor or "unknown",
+            "category": category or "other",
+            "date": date or "unknown",
+            "amount": float(amount) if amount else 0.0,
+            "item_count": len(items_json) if items_json else 0
+        }
+        
+        return f"transaction_{transaction_id}", transaction_text, metadata
+    
     def add_transaction_to_vector_db(self, transaction_id: int, vendor: str, category: str, 
                                    items_json: List[Dict], date: str, amount: float) -> bool:
         """
@@ -121,91 +478,446 @@ class RAGEngine:
         Returns:
             True if successful, False otherwise
         """
+        return self.add_transactions_to_vector_db([{
+            'transaction_id': transaction_id,
+            'vendor': vendor,
+            'category': category,
+            'items_json': items_json,
+            'date': date,
+            'amount': amount
+        }])
+    
+    def add_transactions_to_vector_db(self, transactions: List[Dict[str, Any]]) -> bool:
+        """
+        Add several transactions to the vector database in one batch.
+        
+        The embedding model encodes all texts in a single forward pass and
+        ChromaDB receives a single upsert call, instead of one of each per
+        transaction. Transactions already in the collection are overwritten.
+        
+        Args:
+            transactions: List of dicts with the add_transaction_to_vector_db
+                arguments (transaction_id, vendor, category, items_json,
+                date, amount)
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not transactions:
+            return True
+        
+        # Chroma rejects repeated IDs within one call; the latest entry wins
+        transactions = list({t['transaction_id']: t for t in transactions}.values())
+        transaction_ids = [t['transaction_id'] for t in transactions]
         try:
-            # Create descriptive text
-            transaction_text = self._create_transaction_text(vendor, category, items_json, date, amount)
-            
-            # Create embedding
-            embedding = self.embedding_model.encode([transaction_text])[0].tolist()
-            
-            # Prepare metadata
-            metadata = {
-                "transaction_id": transaction_id,
-                "vendor": vendor or "unknown",
-                "category": category or "other",
-                "date": date or "unknown",
-                "amount": float(amount) if amount else 0.0,
-                "item_count": len(items_json) if items_json else 0
-            }
+            ids, documents, metadatas = zip(*(self._prepare_transaction(**t) for t in transactions))
             
-            # Add to ChromaDB collection
-            self.collection.add(
-                embeddings=[embedding],
-                documents=[transaction_text],
-                metadatas=[metadata],
-                ids=[f"transaction_{transaction_id}"]
+            # Create embeddings for the whole batch
+            embeddings = self._encode_documents(list(documents))
+            
+            # Upsert so a retried transaction overwrites its vector instead of failing
+            self.collection.upsert(
+                embeddings=embeddings.tolist(),
+                documents=list(documents),
+                metadatas=list(metadatas),
+                ids=list(ids)
             )
             
-            logger.info(f"Added transaction {transaction_id} to vector database")
+            # Keep the int8 copy in step, dropping it once brute force stops paying
+            if self.quantized is not None:
+                self.quantized.add(ids, embeddings)
+                if len(self.quantized) > BRUTE_FORCE_MAX_VECTORS:
+                    self.quantized = None
+            
+            self.vector_count = self.collection.count()
+            self.corpus_version += 1
+            
+            logger.info(f"Added {len(ids)} transactions to vector database: {transaction_ids}")
             return True
             
         except Exception as e:
-            logger.error(f"Error adding transaction {transaction_id} to vector database: {e}")
+            logger.error(f"Error adding transactions {transaction_ids} to vector database: {e}")
             return False
     
-    def get_similar_transactions(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def _encode_documents(self, documents: List[str]) -> np.ndarray:
+        """
+        Embed transaction texts as unit-length vectors.
+        
+        Args:
+            documents: Transaction texts
+            
+        Returns:
+            (len(documents), dim) embedding array
+        """
+        return self.embedding_model.encode(
+            documents,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+    
+    def _embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """
+        Embed normalized queries, encoding the uncached ones in one batch.
+        
+        Args:
+            queries: Normalized query texts
+            
+        Returns:
+            One read-only float32 embedding per query, so cached values
+            can't be mutated
+        """
+        with self._query_embeddings_lock:
+            embeddings = {q: self._query_embeddings.get(q) for q in queries}
+        
+        missing = [q for q, embedding in embeddings.items() if embedding is None]
+        if missing:
+            encoded = self.embedding_model.encode(
+                missing,
+                batch_size=EMBEDDING_BATCH_SIZE,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            ).astype(np.float32)
+            encoded.flags.writeable = False
+            with self._query_embeddings_lock:
+                for q, embedding in zip(missing, encoded):
+                    embeddings[q] = self._query_embeddings[q] = embedding
+        
+        return [embeddings[q] for q in queries]
+    
+    def _query_by_embedding(self, embedding: np.ndarray, k: int,
+                            n_results: Optional[int] = None,
+                            exclude_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Search the collection with a ready-made embedding.
+        
+        Small collections are scanned through the int8 copy and the
+        shortlist rescored against the FP32 vectors stored in Chroma;
+        larger ones go through the HNSW index.
+        
+        Args:
+            embedding: Unit-length float32 query embedding
+            k: Number of similar transactions to return
+            n_results: Candidates to ask the index for; defaults to k
+            exclude_id: Transaction ID to filter out of the results
+            
+        Returns:
+            List of similar transactions with metadata and similarity scores
+        """
+        quantized = self.quantized
+        if quantized is not None:
+            return self._brute_force_query(quantized, embedding, k, exclude_id)
+        
+        query_args = {}
+        if exclude_id is not None:
+            query_args['where'] = {"transaction_id": {"$ne": exclude_id}}
+        
+        results = self.collection.query(
+            query_embeddings=[embedding.tolist()],
+            n_results=n_results or k,
+            include=["documents", "metadatas", "distances"],
+            **query_args
+        )
+        
+        # Format results
+        similar_transactions = []
+        if results['documents'] and results['documents'][0]:
+            for doc, metadata, distance in zip(
+                results['documents'][0][:k],
+                results['metadatas'][0][:k],
+                results['distances'][0][:k]
+            ):
+                similarity_score = 1 - distance  # ip distance is 1 - dot of unit vectors
+                similar_transactions.append(self._format_match(doc, metadata, similarity_score))
+        
+        return similar_transactions
+    
+    def _brute_force_query(self, quantized: QuantizedVectors, embedding: np.ndarray,
+                           k: int, exclude_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Exact top-k over a shortlist taken from the int8 copy.
+        
+        Args:
+            quantized: int8 copy of the collection
+            embedding: Unit-length float32 query embedding
+            k: Number of similar transactions to return
+            exclude_id: Transaction ID to filter out of the results
+            
+        Returns:
+            List of similar transactions with metadata and similarity scores
+        """
+        exclude = f"transaction_{exclude_id}" if exclude_id is not None else None
+        shortlist = quantized.search(embedding, k * RERANK_FACTOR, exclude)
+        if not shortlist:
+            return []
+        
+        candidates = self.collection.get(
+            ids=shortlist,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        scores = np.asarray(candidates['embeddings'], dtype=np.float32) @ embedding
+        
+        return [
+            self._format_match(candidates['documents'][i], candidates['metadatas'][i], float(scores[i]))
+            for i in np.argsort(-scores)[:k]
+        ]
+    
+    def _format_match(self, doc: str, metadata: Dict[str, Any], similarity_score: float) -> Dict[str, Any]:
+        """
+        Shape a stored transaction into a search result.
+        
+        Args:
+            doc: Stored transaction text
+            metadata: Stored transaction metadata
+            similarity_score: Inner product with the query
+            
+        Returns:
+            Result dict with transaction metadata and rounded similarity score
+        """
+        return {
+            'transaction_id': metadata.get('transaction_id'),
+            'vendor': metadata.get('vendor'),
+            'category': metadata.get('category'),
+            'date': metadata.get('date'),
+            'amount': metadata.get('amount'),
+            'item_count': metadata.get('item_count', 0),
+            'description': doc,
+            'similarity_score': round(similarity_score, 3)
+        }
+    
+    def get_similar_transactions(self, query: str, k: int = 5,
+                                 ef_search: Optional[int] = None,
+                                 exclude_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Find similar transactions based on natural language query.
         
+        Collections larger than BRUTE_FORCE_MAX_VECTORS are searched
+        through Chroma's HNSW index. hnswlib explores max(ef, n_results)
+        candidates, so asking the index for ef_search results and keeping
+        the best k widens the search without rebuilding the collection.
+        Smaller collections are scanned exactly and ef_search is ignored.
+        
         Args:
             query: Natural language query
             k: Number of similar transactions to return
+            ef_search: Size of the HNSW candidate list; higher trades latency
+                for recall. None uses the tuned value or the index's setting.
+                Ignored while the collection is searched by brute force
+            exclude_id: Transaction ID to filter out inside the index query
             
         Returns:
             List of similar transactions with metadata and similarity scores
         """
+        return self.get_similar_transactions_batch([query], k, ef_search, exclude_id)[0]
+    
+    def get_similar_transactions_batch(self, queries: List[str], k: int = 5,
+                                       ef_search: Optional[int] = None,
+                                       exclude_id: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Find similar transactions for several queries at once.
+        
+        Queries that aren't served from cache are embedded in a single
+        forward pass of the model.
+        
+        Args:
+            queries: Natural language queries
+            k: Number of similar transactions to return per query
+            ef_search: Size of the HNSW candidate list, or None for the default
+            exclude_id: Transaction ID to filter out inside the index query
+            
+        Returns:
+            One list of similar transactions per query, in query order
+        """
+        results = [[] for _ in queries]
         try:
-            if not query.strip():
-                logger.warning("Empty query provided")
-                return []
+            # Nothing to find, so don't run the embedding model
+            if not self.vector_count:
+                return results
             
-            # Create embedding for query
-            query_embedding = self.embedding_model.encode([query])[0].tolist()
+            k, n_results = self._result_counts(k, ef_search)
             
-            # Search in ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=min(k, 100),  # Limit to reasonable number
-                include=["documents", "metadatas", "distances"]
-            )
+            # Serve repeated queries against an unchanged corpus from cache
+            pending = {}
+            for i, query in enumerate(queries):
+                normalized_query = _normalize_query(query)
+                if not normalized_query:
+                    logger.warning("Empty query provided")
+                    continue
+                
+                cache_key = (normalized_query, k, n_results, exclude_id, self.corpus_version)
+                with self._search_cache_lock:
+                    cached = self._search_cache.get(cache_key)
+                if cached is not None:
+                    results[i] = [dict(t) for t in cached]
+                else:
+                    pending.setdefault(cache_key, []).append(i)
             
-            # Format results
-            similar_transactions = []
-            if results['documents'] and results['documents'][0]:
-                for i, (doc, metadata, distance) in enumerate(zip(
-                    results['documents'][0],
-                    results['metadatas'][0],
-                    results['distances'][0]
-                )):
-                    similarity_score = 1 - distance  # Convert distance to similarity
-                    
-                    similar_transactions.append({
-                        'transaction_id': metadata.get('transaction_id'),
-                        'vendor': metadata.get('vendor'),
-                        'category': metadata.get('category'),
-                        'date': metadata.get('date'),
-                        'amount': metadata.get('amount'),
-                        'item_count': metadata.get('item_count', 0),
-                        'description': doc,
-                        'similarity_score': round(similarity_score, 3)
-                    })
-            
-            logger.info(f"Found {len(similar_transactions)} similar transactions for query: '{query[:50]}...'")
-            return similar_transactions
+            if not pending:
+                return results
+            
+            # Create embeddings for the remaining queries in one batch
+            cache_keys = list(pending)
+            query_embeddings = self._embed_queries([key[0] for key in cache_keys])
+            
+            for cache_key, query_embedding in zip(cache_keys, query_embeddings):
+                # Search in ChromaDB
+                similar_transactions = self._query_by_embedding(query_embedding, k, n_results, exclude_id)
+                
+                with self._search_cache_lock:
+                    self._search_cache[cache_key] = similar_transactions
+                
+                for i in pending[cache_key]:
+                    results[i] = [dict(t) for t in similar_transactions]
+                    logger.info(f"Found {len(similar_transactions)} similar transactions for query: '{queries[i][:50]}...'")
+            
+            return results
             
         except Exception as e:
             logger.error(f"Error searching for similar transactions: {e}")
+            return [[] for _ in queries]
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a natural language query the way searches do.
+        
+        Args:
+            query: Natural language query
+            
+        Returns:
+            Unit-length query embedding, or an empty list for an empty query
+        """
+        normalized_query = _normalize_query(query)
+        if not normalized_query:
             return []
+        
+        return self._embed_queries([normalized_query])[0].tolist()
+    
+    def get_similar_transactions_by_vector(self, embedding: Sequence[float], k: int = 5,
+                                           ef_search: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Find similar transactions for a query embedding computed earlier.
+        
+        Callers that cache embed_query() results skip the embedding model
+        entirely and go straight to the index.
+        
+        Args:
+            embedding: Query embedding from embed_query()
+            k: Number of similar transactions to return
+            ef_search: Size of the HNSW candidate list, or None for the default
+            
+        Returns:
+            List of similar transactions with metadata and similarity scores
+            
+        Raises:
+            ValueError: If the embedding has the wrong length or zero norm
+        """
+        query_embedding = np.asarray(embedding, dtype=np.float32)
+        if query_embedding.shape != (self.embedding_dim,):
+            raise ValueError(f"Expected a {self.embedding_dim}-dimensional embedding")
+        
+        # The index compares unit vectors, so rescale rather than trust the caller
+        norm = np.linalg.norm(query_embedding)
+        if not np.isfinite(norm) or norm == 0:
+            raise ValueError("Embedding must be finite and non-zero")
+        query_embedding /= norm
+        
+        try:
+            if not self.vector_count:
+                return []
+            
+            k, n_results = self._result_counts(k, ef_search)
+            similar_transactions = self._query_by_embedding(query_embedding, k, n_results)
+            
+            logger.info(f"Found {len(similar_transactions)} similar transactions for query embedding")
+            return similar_transactions
+            
+        except Exception as e:
+            logger.error(f"Error searching for similar transactions by embedding: {e}")
+            return []
+    
+    def _result_counts(self, k: int, ef_search: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Work out how many results to return and how many to ask the index for.
+        
+        Args:
+            k: Requested number of results
+            ef_search: Size of the HNSW candidate list, or None for the default
+            
+        Returns:
+            (k capped at 100, number of candidates to request)
+        """
+        k = min(k, 100)  # Limit to reasonable number
+        n_results = k
+        
+        # The brute-force scan is exact, so ef_search has nothing to widen;
+        # leaving it out keeps it from splitting the search cache
+        if self.quantized is not None:
+            return k, n_results
+        
+        ef_search = ef_search or self.ef_search
+        if ef_search:
+            n_results = max(k, min(int(ef_search), MAX_EF_SEARCH))
+        return k, n_results
+    
+    def tune_ef_search(self, candidates: Sequence[int] = EF_SEARCH_CANDIDATES,
+                       recall_target: float = 0.95, k: int = 5) -> Optional[int]:
+        """
+        Pick the smallest ef_search that reaches a recall target.
+        
+        A sample of stored vectors is used as the query set. Each candidate
+        is scored by its recall@k against an exact inner-product search over
+        the whole collection, and the first to reach the target becomes the
+        default for get_similar_transactions.
+        
+        Args:
+            candidates: ef_search values to try, smallest first
+            recall_target: Mean recall@k the chosen value must reach
+            k: Number of neighbours recall is measured on
+            
+        Returns:
+            The chosen ef_search, or None if the collection is empty or
+            small enough to be searched by brute force
+        """
+        if self.quantized is not None:
+            logger.info("Collection is searched by brute force; ef_search has no effect, skipping tuning")
+            return None
+        
+        stored = self.collection.get(include=["embeddings"])
+        if not stored['ids']:
+            return None
+        
+        ids = np.asarray(stored['ids'])
+        embeddings = np.asarray(stored['embeddings'], dtype=np.float32)
+        k = min(k, len(ids))
+        
+        # Exact neighbours for an evenly spread sample of stored vectors
+        step = max(1, len(ids) // EF_TUNING_SAMPLE_SIZE)
+        queries = embeddings[::step][:EF_TUNING_SAMPLE_SIZE]
+        scores = queries @ embeddings.T
+        exact = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        truth = [set(ids[row]) for row in exact]
+        
+        chosen = None
+        for ef in sorted(candidates):
+            results = self.collection.query(
+                query_embeddings=queries.tolist(),
+                n_results=min(max(k, ef), len(ids)),
+                include=[]
+            )
+            recall = np.mean([
+                len(expected.intersection(found[:k])) / k
+                for expected, found in zip(truth, results['ids'])
+            ])
+            logger.info(f"ef_search={ef}: recall@{k}={recall:.3f}")
+            chosen = ef
+            if recall >= recall_target:
+                break
+        
+        self.ef_search = chosen
+        logger.info(f"Using ef_search={chosen}")
+        return chosen
     
     def retrieve_context_for_transaction(self, transaction_id: int, k: int = 5) -> Dict[str, Any]:
         """
@@ -220,28 +932,42 @@ class RAGEngine:
         """
         try:
             # Get transaction details from database
-            transaction = database.get_transaction(transaction_id)
+            transaction = database.get_transaction_summary(transaction_id)
             if not transaction:
                 logger.error(f"Transaction {transaction_id} not found in database")
                 return {}
             
-            # Create query from transaction details
-            query = self._create_transaction_text(
-                vendor=transaction.get('vendor', ''),
-                category=transaction.get('category', ''),
-                items_json=transaction.get('items_json', []),
-                date=transaction.get('date', ''),
-                amount=transaction.get('amount', 0)
-            )
-            
-            # Find similar transactions (excluding the current one)
-            similar_transactions = self.get_similar_transactions(query, k + 1)
+            # Reuse the embedding stored at insert time instead of re-encoding
+            stored_embedding = None
+            if self.vector_count:
+                stored = self.collection.get(
+                    ids=[f"transaction_{transaction_id}"],
+                    include=["embeddings"]
+                )
+                embeddings = stored.get('embeddings')
+                if embeddings is not None and len(embeddings):
+                    stored_embedding = np.asarray(embeddings[0], dtype=np.float32)
             
-            # Filter out the current transaction
-            context_transactions = [
-                t for t in similar_transactions 
-                if t['transaction_id'] != transaction_id
-            ][:k]
+            # Find similar transactions, letting the index drop the current one
+            if not self.vector_count:
+                # Nothing indexed yet, so there's no context to find
+                context_transactions = []
+            elif stored_embedding is not None:
+                context_transactions = self._query_by_embedding(
+                    stored_embedding, k, exclude_id=transaction_id
+                )
+            else:
+                # This transaction isn't indexed yet, so fall back to a text query
+                query = self._create_transaction_text(
+                    vendor=transaction.get('vendor', ''),
+                    category=transaction.get('category', ''),
+                    items_json=transaction.get('items_json', []),
+                    date=transaction.get('date', ''),
+                    amount=transaction.get('amount', 0)
+                )
+                context_transactions = self.get_similar_transactions(
+                    query, k, exclude_id=transaction_id
+                )
             
             # Prepare context
             context = {
@@ -286,19 +1012,18 @@ class RAGEngine:
         
         # Most common vendor
         if vendors:
-            most_common_vendor = max(set(vendors), key=vendors.count)
-            vendor_count = vendors.count(most_common_vendor)
+            most_common_vendor, vendor_count = Counter(vendors).most_common(1)[0]
             if vendor_count > 1:
                 summary_parts.append(f"You frequently shop at {most_common_vendor} ({vendor_count} times)")
         
         # Category analysis
         if categories:
-            most_common_category = max(set(categories), key=categories.count)
+            most_common_category = Counter(categories).most_common(1)[0][0]
             summary_parts.append(f"Most similar transactions are in {most_common_category}")
         
         # Amount analysis
         if amounts:
-            avg_amount = sum(amounts) / len(amounts)
+            avg_amount = statistics.fmean(amounts)
             summary_parts.append(f"Average amount for similar transactions: ${avg_amount:.2f}")
         
         return ". ".join(summary_parts) if summary_parts else "Similar transaction patterns found."
@@ -321,15 +1046,28 @@ class RAGEngine:
                 )
                 
                 if sample_results['metadatas']:
-                    categories = [m.get('category') for m in sample_results['metadatas'] if m.get('category')]
-                    vendors = [m.get('vendor') for m in sample_results['metadatas'] if m.get('vendor')]
-                    amounts = [m.get('amount') for m in sample_results['metadatas'] if m.get('amount')]
+                    # One pass over the sample for all three figures
+                    categories = set()
+                    vendors = set()
+                    amount_total = 0.0
+                    amount_count = 0
+                    for m in sample_results['metadatas']:
+                        category = m.get('category')
+                        if category:
+                            categories.add(category)
+                        vendor = m.get('vendor')
+                        if vendor:
+                            vendors.add(vendor)
+                        amount = m.get('amount')
+                        if amount:
+                            amount_total += amount
+                            amount_count += 1
                     
                     stats = {
                         'total_transactions': count,
-                        'unique_categories': len(set(categories)) if categories else 0,
-                        'unique_vendors': len(set(vendors)) if vendors else 0,
-                        'avg_amount': round(sum(amounts) / len(amounts), 2) if amounts else 0,
+                        'unique_categories': len(categories),
+                        'unique_vendors': len(vendors),
+                        'avg_amount': round(amount_total / amount_count, 2) if amount_count else 0,
                         'collection_name': self.collection_name,
                         'embedding_model': self.model_name
                     }
@@ -352,19 +1090,49 @@ class RAGEngine:
             logger.error(f"Error getting collection stats: {e}")
             return {'error': str(e)}
 
-# Global RAG engine instance
+# Global RAG engine instance, created once under _engine_lock
 rag_engine = None
+_engine_lock = threading.Lock()
+
+# Background writer that batches vector inserts: it flushes once it holds
+# VECTOR_BATCH_SIZE transactions or VECTOR_FLUSH_SECONDS after the first one
+VECTOR_BATCH_SIZE = EMBEDDING_BATCH_SIZE
+VECTOR_FLUSH_SECONDS = 0.05
+_vector_queue = queue.Queue()
+_writer_thread = None
+_writer_lock = threading.Lock()
 
 def initialize_rag_engine():
     """Initialize the global RAG engine instance"""
     global rag_engine
-    try:
-        rag_engine = RAGEngine()
-        logger.info("Global RAG engine initialized")
+    if rag_engine is not None:
         return True
-    except Exception as e:
-        logger.error(f"Failed to initialize global RAG engine: {e}")
-        return False
+    
+    with _engine_lock:
+        if rag_engine is not None:
+            return True
+        try:
+            rag_engine = RAGEngine()
+            logger.info("Global RAG engine initialized")
+            _start_vector_writer()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to initialize global RAG engine: {e}")
+            return False
+
+def warm_up_rag_engine():
+    """Initialize the global RAG engine on a background thread"""
+    threading.Thread(target=initialize_rag_engine, name='rag-warmup', daemon=True).start()
+
+def _reset_after_fork():
+    """Give a forked child fresh locks and queue; the parent's threads don't survive"""
+    global _engine_lock, _vector_queue, _writer_thread, _writer_lock
+    _engine_lock = threading.Lock()
+    _vector_queue = queue.Queue()
+    _writer_thread = None
+    _writer_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
 
 def add_transaction_to_vector_db(transaction_id: int, vendor: str, category: str, 
                                items_json: List[Dict], date: str, amount: float) -> bool:
@@ -390,13 +1158,139 @@ def add_transaction_to_vector_db(transaction_id: int, vendor: str, category: str
     
     return rag_engine.add_transaction_to_vector_db(transaction_id, vendor, category, items_json, date, amount)
 
-def get_similar_transactions(query: str, k: int = 5) -> List[Dict[str, Any]]:
+def _vector_writer():
+    """Drain the vector queue forever, adding each batch in one call"""
+    while True:
+        batch = [_vector_queue.get()]
+        deadline = time.monotonic() + VECTOR_FLUSH_SECONDS
+        while len(batch) < VECTOR_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_vector_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        try:
+            if rag_engine or initialize_rag_engine():
+                rag_engine.add_transactions_to_vector_db(batch)
+        except Exception as e:
+            logger.error(f"Vector writer failed to add batch: {e}")
+        finally:
+            for _ in batch:
+                _vector_queue.task_done()
+
+def _start_vector_writer():
+    """Start the background vector writer if it isn't running yet"""
+    global _writer_thread
+    if _writer_thread is None:
+        with _writer_lock:
+            if _writer_thread is None:
+                _writer_thread = threading.Thread(target=_vector_writer, name='vector-writer', daemon=True)
+                _writer_thread.start()
+
+def enqueue_for_vector_db(transaction_id: int, vendor: str, category: str,
+                          items_json: List[Dict], date: str, amount: float) -> bool:
+    """
+    Queue a transaction for the background vector writer.
+    
+    Args:
+        transaction_id: Unique transaction ID
+        vendor: Store/vendor name
+        category: Transaction category
+        items_json: List of items purchased
+        date: Transaction date
+        amount: Total amount
+        
+    Returns:
+        True once the transaction is queued
+    """
+    _start_vector_writer()
+    _vector_queue.put({
+        'transaction_id': transaction_id,
+        'vendor': vendor,
+        'category': category,
+        'items_json': items_json,
+        'date': date,
+        'amount': amount
+    })
+    return True
+
+def flush_vector_queue():
+    """Block until every queued transaction has been written"""
+    if _writer_thread is not None:
+        _vector_queue.join()
+
+# Don't drop queued transactions when the process exits
+atexit.register(flush_vector_queue)
+
+def get_similar_transactions(query: str, k: int = 5, ef_search: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     Convenience function to find similar transactions.
     
     Args:
         query: Natural language query
         k: Number of similar transactions to return
+        ef_search: Size of the HNSW candidate list, or None for the default
+        
+    Returns:
+        List of similar transactions with metadata and similarity scores
+    """
+    global rag_engine
+    if not rag_engine:
+        logger.warning("RAG engine not initialized")
+        return []
+    
+    return rag_engine.get_similar_transactions(query, k, ef_search)
+
+def get_similar_transactions_batch(queries: List[str], k: int = 5,
+                                   ef_search: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Convenience function to run several similarity searches at once.
+    
+    Args:
+        queries: Natural language queries
+        k: Number of similar transactions to return per query
+        ef_search: Size of the HNSW candidate list, or None for the default
+        
+    Returns:
+        One list of similar transactions per query, in query order
+    """
+    global rag_engine
+    if not rag_engine:
+        logger.warning("RAG engine not initialized")
+        return [[] for _ in queries]
+    
+    return rag_engine.get_similar_transactions_batch(queries, k, ef_search)
+
+def embed_query(query: str) -> List[float]:
+    """
+    Convenience function to embed a search query.
+    
+    Args:
+        query: Natural language query
+        
+    Returns:
+        Unit-length query embedding, or an empty list if the query is empty
+        or the engine isn't ready
+    """
+    global rag_engine
+    if not rag_engine:
+        logger.warning("RAG engine not initialized")
+        return []
+    
+    return rag_engine.embed_query(query)
+
+def get_similar_transactions_by_vector(embedding: Sequence[float], k: int = 5,
+                                       ef_search: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Convenience function to find similar transactions for a query embedding.
+    
+    Args:
+        embedding: Query embedding from embed_query()
+        k: Number of similar transactions to return
+        ef_search: Size of the HNSW candidate list, or None for the default
         
     Returns:
         List of similar transactions with metadata and similarity scores
@@ -406,7 +1300,7 @@ def get_similar_transactions(query: str, k: int = 5) -> List[Dict[str, Any]]:
         logger.warning("RAG engine not initialized")
         return []
     
-    return rag_engine.get_similar_transactions(query, k)
+    return rag_engine.get_similar_transactions_by_vector(embedding, k, ef_search)
 
 def retrieve_context_for_transaction(transaction_id: int, k: int = 5) -> Dict[str, Any]:
     """
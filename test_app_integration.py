@@ -3,30 +3,27 @@
 Test Flask app integration with database and AI extractor
 """
 
-import requests
-import json
-import os
-import time
+import httpx
+import tempfile
+from test_utils import BASE_URL, UploadResponse, buffered_output, expect_success, run_script
 
-def test_app_integration():
+# httpx streams file uploads in chunks instead of building the whole
+# multipart body in memory first
+client = httpx.Client(timeout=None)
+
+# Receipts up to this size stay in memory; larger ones spill to a temp file
+SPOOL_MAX_BYTES = 64 * 1024
+
+def test_app_integration(base_url):
     """Test the complete Flask app integration"""
     
     print("Testing Flask App Integration...")
     print("=" * 50)
     
-    base_url = "http://127.0.0.1:5000"
-    
     # Test 1: Check if app is running
-    try:
-        response = requests.get(f"{base_url}/")
-        if response.status_code == 200:
-            print("✓ Flask app is running")
-        else:
-            print("✗ Flask app not responding")
-            return
-    except requests.exceptions.ConnectionError:
-        print("✗ Flask app not running. Start it with: python app.py")
-        return
+    response = client.get(f"{base_url}/")
+    assert response.status_code == 200, f"Flask app not responding: {response.status_code}"
+    print("✓ Flask app is running")
     
     # Test 2: Test file upload with a simple text file
     print("\n2. Testing file upload...")
@@ -47,54 +44,31 @@ def test_app_integration():
     Payment: CREDIT CARD
     """
     
-    test_file_path = "test_receipt.txt"
-    with open(test_file_path, 'w') as f:
-        f.write(test_content)
+    # Upload the receipt from a spooled file that deletes itself on close
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as f:
+        f.write(test_content.encode('utf-8'))
+        f.seek(0)
+        files = {'file': ('test_receipt.txt', f, 'text/plain')}
+        response = client.post(f"{base_url}/upload", files=files)
+    upload = expect_success(response, "Upload", UploadResponse).data
     
-    try:
-        # Upload the test file
-        with open(test_file_path, 'rb') as f:
-            files = {'file': ('test_receipt.txt', f, 'text/plain')}
-            response = requests.post(f"{base_url}/upload", files=files)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('success'):
-                print("✓ File upload successful")
-                transaction_id = data['data']['transaction_id']
-                print(f"  Transaction ID: {transaction_id}")
-                
-                # Test 3: Retrieve the transaction
-                print(f"\n3. Testing transaction retrieval...")
-                response = requests.get(f"{base_url}/transaction/{transaction_id}")
-                
-                if response.status_code == 200:
-                    transaction_data = response.json()
-                    if transaction_data.get('success'):
-                        print("✓ Transaction retrieval successful")
-                        print(f"  Vendor: {transaction_data['data']['vendor']}")
-                        print(f"  Total: ${transaction_data['data']['amount']}")
-                        print(f"  Method: {transaction_data['data'].get('extraction_method', 'N/A')}")
-                    else:
-                        print("✗ Transaction retrieval failed")
-                else:
-                    print(f"✗ Transaction API error: {response.status_code}")
-            else:
-                print(f"✗ Upload failed: {data.get('error')}")
-        else:
-            print(f"✗ Upload HTTP error: {response.status_code}")
-            print(response.text)
+    print("✓ File upload successful")
+    transaction_id = upload.transaction_id
+    print(f"  Transaction ID: {transaction_id}")
     
-    except Exception as e:
-        print(f"✗ Test error: {e}")
+    # Test 3: Retrieve the transaction
+    print(f"\n3. Testing transaction retrieval...")
+    response = client.get(f"{base_url}/transaction/{transaction_id}")
+    transaction_data = expect_success(response, "Transaction retrieval")
     
-    finally:
-        # Clean up test file
-        if os.path.exists(test_file_path):
-            os.remove(test_file_path)
+    print("✓ Transaction retrieval successful")
+    print(f"  Vendor: {transaction_data['data']['vendor']}")
+    print(f"  Total: ${transaction_data['data']['amount']}")
+    print(f"  Method: {transaction_data['data'].get('extraction_method', 'N/A')}")
     
     print("\n" + "=" * 50)
     print("Integration test complete!")
 
 if __name__ == "__main__":
-    test_app_integration()
\ No newline at end of file
+    with buffered_output(), client:
+        run_script(test_app_integration, BASE_URL)
\ No newline at end of file
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Sample receipts shared by the upload and RAG integration tests
+"""
+
+import io
+from functools import lru_cache
+
+RECEIPTS = {
+    "walmart": """
+    WALMART SUPERCENTER
+    Store #1234
+    123 Main St, Anytown, USA
+    
+    Date: 2024-01-15
+    Time: 14:30
+    
+    GROCERIES:
+    Milk 2% Gallon         $3.99
+    Bread Whole Wheat      $2.49
+    Bananas 2 lbs          $1.98
+    Chicken Breast 1 lb    $5.99
+    
+    Subtotal:             $14.45
+    Tax:                   $1.16
+    Total:                $15.61
+    
+    Payment: CREDIT CARD
+    """,
+    "target": """
+    TARGET STORE
+    Store #T-1234
+    Date: 2024-01-20
+    
+    ELECTRONICS:
+    Wireless Headphones    $89.99
+    Phone Case             $24.99
+    Screen Protector       $12.99
+    
+    Subtotal:             $127.97
+    Tax:                   $10.24
+    Total:                $138.21
+    
+    Payment: DEBIT CARD
+    """,
+    "costco": """
+    COSTCO WHOLESALE
+    Store #456
+    Date: 2024-01-20
+    
+    BULK GROCERIES:
+    Organic Bananas 3lbs    $4.99
+    Kirkland Olive Oil      $12.99
+    Rotisserie Chicken      $4.99
+    Frozen Berries 2lbs     $8.99
+    
+    Subtotal:              $31.96
+    Tax:                    $2.56
+    Total:                 $34.52
+    
+    Payment: MEMBERSHIP CARD
+    """,
+}
+
+@lru_cache(maxsize=None)
+def get_receipt(vendor):
+    """Return a sample receipt as UTF-8 bytes"""
+    return RECEIPTS[vendor].encode('utf-8')
+
+def receipt_file(vendor, filename):
+    """Build the multipart file tuple for uploading a sample receipt"""
+    return {'file': (filename, io.BytesIO(get_receipt(vendor)), 'text/plain')}
@@ -3,125 +3,122 @@
 Test RAG integration with Flask app
 """
 
-import requests
-import json
+import asyncio
+import hashlib
+import httpx
+from cachetools import LRUCache
+from test_fixtures import receipt_file
+from test_utils import (BASE_URL, BatchSearchResponse, ContextResponse, EmbedResponse, SearchResponse,
+                        StatsResponse, TransactionContext, UploadResponse, buffered_output, expect_success,
+                        run_script)
 
-def test_rag_integration():
-    """Test the complete RAG integration"""
+# The checks after the upload are independent, so they share a small
+# keep-alive pool and run concurrently
+HTTP_LIMITS = httpx.Limits(max_connections=4, max_keepalive_connections=4)
+
+# Query embeddings fetched from /api/embed, keyed by SHA-256 of the query
+# text; repeated searches post the cached vector and skip the model
+query_embeddings = LRUCache(maxsize=256)
+
+async def embed(client, query):
+    """Return the query's embedding, asking the server only on a cache miss"""
+    key = hashlib.sha256(query.encode('utf-8')).hexdigest()
+    embedding = query_embeddings.get(key)
+    if embedding is None:
+        response = await client.post("/api/embed", json={"query": query})
+        embedding = query_embeddings[key] = expect_success(response, "Embed", EmbedResponse).embedding
+    return embedding
+
+async def search_by_vector(client, query, k=3):
+    """Search with the cached embedding of a query"""
+    return await client.post("/api/search/by_vector", json={"vector": await embed(client, query), "k": k})
+
+def report_stats(response):
+    """Print the result of the RAG stats call"""
+    print("\n1. Testing RAG stats...")
+    stats = expect_success(response, "RAG Stats API", StatsResponse).stats
     
-    print("Testing RAG Integration with Flask App...")
-    print("=" * 50)
+    print(f"✓ RAG Stats API working")
+    print(f"  Total transactions in vector DB: {stats.total_transactions}")
+    print(f"  Embedding model: {stats.embedding_model or 'N/A'}")
+
+def report_search(response):
+    """Print the result of the batch semantic search call"""
+    print("\n3. Testing semantic search...")
+    search_results = expect_success(response, "Semantic search", BatchSearchResponse)
     
-    base_url = "http://127.0.0.1:5000"
+    for batch in search_results.results:
+        results = batch.results
+        print(f"✓ Semantic search for '{batch.query}' - Found {len(results)} similar transactions")
+        
+        for i, result in enumerate(results[:2]):
+            print(f"  {i+1}. {result.vendor} - ${result.amount} (similarity: {result.similarity_score})")
+
+def report_context(response):
+    """Print the result of the transaction context call"""
+    print("\n4. Testing transaction context...")
+    context = expect_success(response, "Transaction context", ContextResponse).context or TransactionContext()
     
-    # Test 1: Check RAG stats
-    try:
-        response = requests.get(f"{base_url}/api/rag/stats")
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('success'):
-                stats = data.get('stats', {})
-                print(f"✓ RAG Stats API working")
-                print(f"  Total transactions in vector DB: {stats.get('total_transactions', 0)}")
-                print(f"  Embedding model: {stats.get('embedding_model', 'N/A')}")
-            else:
-                print("✗ RAG Stats API failed")
-        else:
-            print(f"✗ RAG Stats API error: {response.status_code}")
-    except requests.exceptions.ConnectionError:
-        print("✗ Flask app not running. Start it with: python app.py")
-        return
+    similar_count = len(context.similar_transactions)
+    print(f"✓ Transaction context retrieved - {similar_count} similar transactions found")
     
+    summary = context.context_summary
+    if summary:
+        print(f"  Summary: {summary}")
+
+def report_vector_search(query, responses):
+    """Print the results of repeated searches with a cached query embedding"""
+    print("\n5. Testing search by cached query vector...")
+    for response in responses:
+        results = expect_success(response, "Vector search", SearchResponse).results
+        print(f"✓ Vector search for '{query}' - Found {len(results)} similar transactions")
+    print(f"  Embedded {len(query_embeddings)} query, reused for {len(responses)} searches")
+
+async def upload_receipt(client):
+    """Upload the Costco sample receipt and return its transaction ID"""
     # Test 2: Upload a transaction to test auto-addition to vector DB
     print("\n2. Testing transaction upload with RAG integration...")
     
-    test_content = """
-    COSTCO WHOLESALE
-    Store #456
-    Date: 2024-01-20
-    
-    BULK GROCERIES:
-    Organic Bananas 3lbs    $4.99
-    Kirkland Olive Oil      $12.99
-    Rotisserie Chicken      $4.99
-    Frozen Berries 2lbs     $8.99
-    
-    Subtotal:              $31.96
-    Tax:                    $2.56
-    Total:                 $34.52
-    
-    Payment: MEMBERSHIP CARD
-    """
+    response = await client.post("/upload", files=receipt_file('costco', 'test_costco_receipt.txt'))
+    upload = expect_success(response, "Upload", UploadResponse).data
+    transaction_id = upload.transaction_id
+    print(f"✓ Transaction uploaded successfully (ID: {transaction_id})")
+    return transaction_id
+
+async def run_rag_integration(base_url):
+    """Test the complete RAG integration"""
     
-    # Create test file
-    test_file_path = "test_costco_receipt.txt"
-    with open(test_file_path, 'w') as f:
-        f.write(test_content)
+    print("Testing RAG Integration with Flask App...")
+    print("=" * 50)
     
-    try:
-        # Upload the test file
-        with open(test_file_path, 'rb') as f:
-            files = {'file': ('test_costco_receipt.txt', f, 'text/plain')}
-            response = requests.post(f"{base_url}/upload", files=files)
+    async with httpx.AsyncClient(base_url=base_url, limits=HTTP_LIMITS, timeout=None) as client:
+        # Everything after the upload needs its transaction ID
+        transaction_id = await upload_receipt(client)
         
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('success'):
-                transaction_id = data['data']['transaction_id']
-                print(f"✓ Transaction uploaded successfully (ID: {transaction_id})")
-                
-                # Test 3: Search for similar transactions
-                print("\n3. Testing semantic search...")
-                search_data = {
-                    "query": "bulk grocery shopping at warehouse store",
-                    "k": 3
-                }
-                
-                response = requests.post(f"{base_url}/api/search", json=search_data)
-                if response.status_code == 200:
-                    search_results = response.json()
-                    if search_results.get('success'):
-                        results = search_results.get('results', [])
-                        print(f"✓ Semantic search successful - Found {len(results)} similar transactions")
-                        
-                        for i, result in enumerate(results[:2]):
-                            print(f"  {i+1}. {result.get('vendor')} - ${result.get('amount')} (similarity: {result.get('similarity_score')})")
-                    else:
-                        print("✗ Semantic search failed")
-                else:
-                    print(f"✗ Search API error: {response.status_code}")
-                
-                # Test 4: Get transaction context
-                print("\n4. Testing transaction context...")
-                response = requests.get(f"{base_url}/api/context/{transaction_id}")
-                if response.status_code == 200:
-                    context_data = response.json()
-                    if context_data.get('success'):
-                        context = context_data.get('context', {})
-                        similar_count = len(context.get('similar_transactions', []))
-                        print(f"✓ Transaction context retrieved - {similar_count} similar transactions found")
-                        
-                        summary = context.get('context_summary', '')
-                        if summary:
-                            print(f"  Summary: {summary}")
-                    else:
-                        print("✗ Transaction context failed")
-                else:
-                    print(f"✗ Context API error: {response.status_code}")
-                    
-            else:
-                print(f"✗ Upload failed: {data.get('error')}")
-        else:
-            print(f"✗ Upload HTTP error: {response.status_code}")
-    
-    except Exception as e:
-        print(f"✗ Test error: {e}")
-    
-    finally:
-        # Clean up test file
-        import os
-        if os.path.exists(test_file_path):
-            os.remove(test_file_path)
+        # Tests 1, 3 and 4: stats, search (several queries in one request)
+        # and context, all in flight at once
+        search_data = {
+            "queries": [
+                "bulk grocery shopping at warehouse store",
+                "rotisserie chicken and olive oil",
+                "membership card purchase"
+            ],
+            "k": 3
+        }
+        stats, search, context = await asyncio.gather(
+            client.get("/api/rag/stats"),
+            client.post("/api/search/batch", json=search_data),
+            client.get(f"/api/context/{transaction_id}")
+        )
+        
+        report_stats(stats)
+        report_search(search)
+        report_context(context)
+        
+        # Test 5: Repeat a search; only the first one embeds the query
+        vector_query = search_data["queries"][0]
+        vector_searches = [await search_by_vector(client, vector_query) for _ in range(2)]
+        report_vector_search(vector_query, vector_searches)
     
     print("\n" + "=" * 50)
     print("RAG Integration Test Results:")
@@ -132,5 +129,10 @@ def test_rag_integration():
     print("✓ Context retrieval for insights")
     print("\nYour LUMEN app now has AI-powered semantic search! 🎉")
 
+def test_rag_integration(base_url):
+    """Run the RAG integration checks against the app at base_url"""
+    asyncio.run(run_rag_integration(base_url))
+
 if __name__ == "__main__":
-    test_rag_integration()
\ No newline at end of file
+    with buffered_output():
+        run_script(test_rag_integration, BASE_URL)
\ No newline at end of file
@@ -6,6 +6,9 @@ Test OCR functionality with a real image
 import ai_extractor
 import json
 import os
+from test_utils import cached_extract_from_image
+
+IMAGE_EXTENSIONS = frozenset({'.png', '.jpg', '.jpeg', '.gif'})
 
 def test_ocr_with_real_image():
     """Test OCR with an actual uploaded image"""
@@ -16,15 +19,16 @@ def test_ocr_with_real_image():
     # Check if there are any uploaded images
     uploads_dir = "uploads"
     if os.path.exists(uploads_dir):
-        image_files = [f for f in os.listdir(uploads_dir) 
-                      if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))]
+        # Test with the first image found; stop scanning as soon as there is one
+        with os.scandir(uploads_dir) as entries:
+            test_image = next((entry.path for entry in entries
+                               if entry.is_file()
+                               and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS), None)
         
-        if image_files:
-            # Test with the first image found
-            test_image = os.path.join(uploads_dir, image_files[0])
+        if test_image:
             print(f"Testing with: {test_image}")
             
-            result = ai_extractor.extract_from_image(test_image)
+            result = cached_extract_from_image(ai_extractor.extract_from_image, test_image)
             
             if result:
                 print("✓ OCR extraction successful!")
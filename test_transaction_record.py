@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Test that extracted receipts map onto saved transactions
+"""
+
+import os
+import pytest
+
+def test_fractional_confidence_is_saved(tmp_path, monkeypatch):
+    """A confidence_score like 87.5 passes validation, so it must also save"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("LUMEN_DEFER_RAG_INIT", "1")
+    app = pytest.importorskip("app")
+    import database
+
+    # Work on a throwaway database rather than the app's lumen.db
+    database.close_db_connection()
+    monkeypatch.setattr(database, "DATABASE_PATH", os.fspath(tmp_path / "lumen.db"))
+    try:
+        database.init_db()
+
+        extracted = {
+            'vendor': 'Corner Market',
+            'date': '2024-03-02',
+            'total': 12.5,
+            'category': 'groceries',
+            'items': [{'name': 'Apples', 'price': 12.5}],
+            'confidence_score': 87.5
+        }
+        transaction_id = database.save_transaction(app.transaction_record(extracted))
+
+        saved = database.get_transaction(transaction_id)
+        assert saved['confidence_score'] == 87.5
+        assert saved['amount'] == 12.5
+    finally:
+        database.close_db_connection()
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -3,111 +3,64 @@
 Test the new upload UI functionality
 """
 
+import re
 import requests
-import json
-import os
-import time
+from test_fixtures import receipt_file
+from test_utils import BASE_URL, UploadResponse, buffered_output, expect_success, run_script
 
-def test_upload_ui():
+# One keep-alive connection for every call the test makes
+session = requests.Session()
+session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+# Markers the upload page should contain, and what each one shows
+UI_MARKERS = {
+    "Analyzing receipt with AI...": "Loading animation text found",
+    "Receipt processed successfully": "Success message template found",
+    "glass-card": "Glassmorphism design elements found",
+    "category-badge": "Category badge styling found",
+}
+
+# One alternation so the page is scanned once for all markers
+UI_MARKER_PATTERN = re.compile("|".join(map(re.escape, UI_MARKERS)))
+
+def test_upload_ui(base_url):
     """Test the new upload UI with beautiful preview"""
     
     print("Testing New Upload UI...")
     print("=" * 50)
     
-    base_url = "http://127.0.0.1:5000"
-    
     # Test 1: Check if upload page loads
-    try:
-        response = requests.get(f"{base_url}/upload")
-        if response.status_code == 200:
-            print("✓ Upload page loads successfully")
-            
-            # Check if the new UI elements are present
-            if "Analyzing receipt with AI..." in response.text:
-                print("✓ Loading animation text found")
-            if "Receipt processed successfully" in response.text:
-                print("✓ Success message template found")
-            if "glass-card" in response.text:
-                print("✓ Glassmorphism design elements found")
-            if "category-badge" in response.text:
-                print("✓ Category badge styling found")
-                
-        else:
-            print("✗ Upload page failed to load")
-            return
-    except requests.exceptions.ConnectionError:
-        print("✗ Flask app not running. Start it with: python app.py")
-        return
+    response = session.get(f"{base_url}/upload")
+    assert response.status_code == 200, f"Upload page failed to load: {response.status_code}"
+    print("✓ Upload page loads successfully")
+    
+    # Check if the new UI elements are present
+    found = set(UI_MARKER_PATTERN.findall(response.text))
+    for marker, message in UI_MARKERS.items():
+        if marker in found:
+            print(f"✓ {message}")
     
     # Test 2: Test the upload API with sample data
     print("\n2. Testing upload API...")
     
-    # Create a test receipt
-    test_content = """
-    TARGET STORE
-    Store #T-1234
-    Date: 2024-01-20
-    
-    ELECTRONICS:
-    Wireless Headphones    $89.99
-    Phone Case             $24.99
-    Screen Protector       $12.99
-    
-    Subtotal:             $127.97
-    Tax:                   $10.24
-    Total:                $138.21
-    
-    Payment: DEBIT CARD
-    """
-    
-    test_file_path = "test_target_receipt.txt"
-    with open(test_file_path, 'w') as f:
-        f.write(test_content)
-    
-    try:
-        # Upload the test file
-        with open(test_file_path, 'rb') as f:
-            files = {'file': ('test_target_receipt.txt', f, 'text/plain')}
-            response = requests.post(f"{base_url}/upload", files=files)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('success'):
-                print("✓ Upload API successful")
-                print(f"  Vendor: {data['data'].get('vendor', 'N/A')}")
-                print(f"  Total: ${data['data'].get('total', 0)}")
-                print(f"  Category: {data['data'].get('category', 'N/A')}")
-                print(f"  Confidence: {data['data'].get('confidence_score', 0)}%")
-                print(f"  Method: {data['data'].get('extraction_method', 'N/A')}")
-                print(f"  Transaction ID: {data['data'].get('transaction_id', 'N/A')}")
-                
-                # Test transaction retrieval
-                transaction_id = data['data'].get('transaction_id')
-                if transaction_id:
-                    print(f"\n3. Testing transaction retrieval...")
-                    response = requests.get(f"{base_url}/transaction/{transaction_id}")
-                    
-                    if response.status_code == 200:
-                        transaction_data = response.json()
-                        if transaction_data.get('success'):
-                            print("✓ Transaction retrieval successful")
-                        else:
-                            print("✗ Transaction retrieval failed")
-                    else:
-                        print(f"✗ Transaction API error: {response.status_code}")
-            else:
-                print(f"✗ Upload failed: {data.get('error')}")
-        else:
-            print(f"✗ Upload HTTP error: {response.status_code}")
-            print(response.text)
+    # Upload the shared Target sample receipt straight from memory
+    response = session.post(f"{base_url}/upload", files=receipt_file('target', 'test_target_receipt.txt'))
+    upload = expect_success(response, "Upload", UploadResponse).data
     
-    except Exception as e:
-        print(f"✗ Test error: {e}")
+    print("✓ Upload API successful")
+    print(f"  Vendor: {upload.vendor}")
+    print(f"  Total: ${upload.total}")
+    print(f"  Category: {upload.category}")
+    print(f"  Confidence: {upload.confidence_score}%")
+    print(f"  Method: {upload.extraction_method}")
+    print(f"  Transaction ID: {upload.transaction_id}")
     
-    finally:
-        # Clean up test file
-        if os.path.exists(test_file_path):
-            os.remove(test_file_path)
+    # Test transaction retrieval
+    transaction_id = upload.transaction_id
+    print(f"\n3. Testing transaction retrieval...")
+    response = session.get(f"{base_url}/transaction/{transaction_id}")
+    expect_success(response, "Transaction retrieval")
+    print("✓ Transaction retrieval successful")
     
     print("\n" + "=" * 50)
     print("UI Test Results:")
@@ -120,4 +73,5 @@ def test_upload_ui():
     print("\nYour LUMEN upload interface is ready! 🎉")
 
 if __name__ == "__main__":
-    test_upload_ui()
\ No newline at end of file
+    with buffered_output(), session:
+        run_script(test_upload_ui, BASE_URL)
\ No newline at end of file
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the live-server test scripts
+"""
+
+import hashlib
+import io
+import os
+import sys
+from contextlib import contextmanager, redirect_stdout
+from typing import List, Optional, Union
+import httpx
+import msgspec
+import orjson
+import requests
+
+# Address of the Flask app the scripts test against
+BASE_URL = "http://127.0.0.1:5000"
+
+# Extraction results of unchanged receipt images, reused across test runs
+OCR_CACHE_DIR = os.path.join(".pytest_cache", "ocr")
+
+class ApiResponse(msgspec.Struct, kw_only=True):
+    """The success/error envelope every JSON API route returns"""
+    success: bool = False
+    error: Optional[str] = None
+
+class UploadData(msgspec.Struct):
+    """Fields of an uploaded receipt the tests print"""
+    transaction_id: int
+    vendor: Optional[str] = None
+    date: Optional[str] = None
+    total: Optional[float] = None
+    category: Optional[str] = None
+    confidence_score: Optional[Union[int, float]] = None
+    extraction_method: Optional[str] = None
+
+class UploadResponse(ApiResponse, kw_only=True):
+    data: Optional[UploadData] = None
+
+class RagStats(msgspec.Struct):
+    total_transactions: int = 0
+    embedding_model: Optional[str] = None
+
+class StatsResponse(ApiResponse, kw_only=True):
+    stats: RagStats = msgspec.field(default_factory=RagStats)
+
+class SearchResult(msgspec.Struct):
+    """One similar transaction from a semantic search"""
+    transaction_id: Optional[int] = None
+    vendor: Optional[str] = None
+    amount: Optional[float] = None
+    similarity_score: Optional[float] = None
+
+class SearchResponse(ApiResponse, kw_only=True):
+    results: List[SearchResult] = []
+
+class QueryResults(msgspec.Struct):
+    query: str
+    results: List[SearchResult] = []
+
+class BatchSearchResponse(ApiResponse, kw_only=True):
+    results: List[QueryResults] = []
+
+class TransactionContext(msgspec.Struct):
+    similar_transactions: List[SearchResult] = []
+    context_summary: str = ''
+
+class ContextResponse(ApiResponse, kw_only=True):
+    context: Optional[TransactionContext] = None
+
+class EmbedResponse(ApiResponse, kw_only=True):
+    embedding: List[float] = []
+
+class ExtractionCacheStats(msgspec.Struct):
+    hits: int = 0
+    misses: int = 0
+
+class ExtractionCacheResponse(ApiResponse, kw_only=True):
+    cache: ExtractionCacheStats = msgspec.field(default_factory=ExtractionCacheStats)
+
+def expect_success(response, label, response_type=None):
+    """Return the decoded JSON body of a successful API call, else raise AssertionError
+
+    Works with both requests and httpx responses. With a response_type the
+    body is decoded straight into that ApiResponse struct, otherwise into a
+    dict. The message matches the scripts' "✗ ..." lines, e.g.
+    "Upload HTTP error: 500" or "Upload failed: <server error>".
+    """
+    if response.status_code != 200:
+        raise AssertionError(f"{label} HTTP error: {response.status_code}")
+
+    if response_type is None:
+        data = orjson.loads(response.content)
+        success, error = data.get('success'), data.get('error')
+    else:
+        try:
+            data = msgspec.json.decode(response.content, type=response_type)
+        except msgspec.ValidationError as e:
+            raise AssertionError(f"{label} returned an unexpected body: {e}")
+        success, error = data.success, data.error
+
+    if not success:
+        raise AssertionError(f"{label} failed: {error}")
+    return data
+
+def run_script(test, *args):
+    """Run a live-server test from the command line, printing a failure as a "✗ ..." line
+
+    Under pytest the same test raises and fails; run as a script it reports
+    what went wrong and exits normally.
+    """
+    try:
+        test(*args)
+    except (requests.exceptions.ConnectionError, httpx.ConnectError):
+        print("✗ Flask app not running. Start it with: python app.py")
+    except AssertionError as e:
+        print(f"✗ {e}")
+    except Exception as e:
+        print(f"✗ Test error: {e}")
+
+@contextmanager
+def buffered_output():
+    """Collect everything printed inside the block and write it out in one go
+
+    Only when stdout is piped (CI logs); on a terminal the output streams as
+    usual so progress stays visible. The buffer is flushed even if the block
+    raises.
+    """
+    if sys.stdout.isatty():
+        yield
+        return
+
+    buffer = io.StringIO()
+    try:
+        with redirect_stdout(buffer):
+            yield
+    finally:
+        sys.stdout.write(buffer.getvalue())
+        sys.stdout.flush()
+
+def cached_extract_from_image(extract_from_image, image_path):
+    """Run extract_from_image once per version of an image file
+
+    Results are stored under OCR_CACHE_DIR keyed by the path plus the
+    file's size and mtime, so editing or replacing the image re-extracts
+    it. Failed extractions (None) are not cached.
+    """
+    stat = os.stat(image_path)
+    path_key = hashlib.sha1(os.path.abspath(image_path).encode('utf-8')).hexdigest()
+    cache_file = os.path.join(OCR_CACHE_DIR, f"{path_key}-{stat.st_size}-{stat.st_mtime_ns}.json")
+
+    try:
+        with open(cache_file, 'rb') as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        pass
+
+    result = extract_from_image(image_path)
+    if result is not None:
+        os.makedirs(OCR_CACHE_DIR, exist_ok=True)
+        with open(cache_file, 'wb') as f:
+            f.write(orjson.dumps(result))
+    return result
@@ -3,19 +3,33 @@
 Test with the actual Walmart receipt
 """
 
-import ai_extractor
+import glob
+import math
+import os
+import re
+import pytest
 import json
+from test_utils import cached_extract_from_image
 
-def test_walmart_receipt():
+# Every uploaded JPG receipt, falling back to the original bill2.jpg sample
+RECEIPT_IMAGES = sorted(glob.glob("uploads/*.jpg")) or ["uploads/20251114_171748_bill2.jpg"]
+
+# What the bill2.jpg Walmart receipt actually says
+EXPECTED_VENDOR = re.compile(r"walmart", re.IGNORECASE)
+EXPECTED_TOTAL = 90.32
+
+@pytest.mark.parametrize("test_image", RECEIPT_IMAGES)
+def test_walmart_receipt(ai, test_image):
     """Test with the actual Walmart receipt image"""
     
+    if not os.path.exists(test_image):
+        pytest.skip(f"{test_image} not found; upload a receipt first")
+    
     print("Testing with Walmart Receipt...")
     print("=" * 50)
+    print(f"Image: {test_image}")
     
-    # Test with the bill2.jpg file
-    test_image = "uploads/20251114_171748_bill2.jpg"
-    
-    result = ai_extractor.extract_from_image(test_image)
+    result = cached_extract_from_image(ai.extract_from_image, test_image)
     
     if result:
         print("✓ Walmart receipt analysis successful!")
@@ -31,7 +45,11 @@ def test_walmart_receipt():
         for item in result.get('items', []):
             print(f"  - {item.get('name')}: ${item.get('price')}")
         
-        if result.get('total') == 90.32:
+        # Compare totals within half a cent; parsed floats rarely match exactly
+        total = result.get('total')
+        if (EXPECTED_VENDOR.search(result.get('vendor') or '')
+                and isinstance(total, (int, float))
+                and math.isclose(total, EXPECTED_TOTAL, abs_tol=0.005)):
             print("\n🎉 Perfect match with your actual receipt!")
         else:
             print(f"\nℹ️ Analyzed receipt (Total: ${result.get('total')})")
@@ -41,4 +59,10 @@ def test_walmart_receipt():
     print("\n" + "=" * 50)
 
 if __name__ == "__main__":
-    test_walmart_receipt()
\ No newline at end of file
+    import ai_extractor
+    ai_extractor.warm_up()
+    for test_image in RECEIPT_IMAGES:
+        if os.path.exists(test_image):
+            test_walmart_receipt(ai_extractor, test_image)
+        else:
+            print(f"{test_image} not found; upload a receipt first")
\ No newline at end of file